@@ -0,0 +1,175 @@
+import json
+import logging
+import time
+
+# Статусы, при которых задание ещё выполняется
+ACTIVE_STATUSES = {"validating", "in_progress", "finalizing", "cancelling"}
+# Конечные статусы, при которых часть запросов может быть выполнена (expired/cancelled - частично)
+RESULT_STATUSES = {"completed", "expired", "cancelled"}
+
+
+# Пакетные задания через OpenAI Batch API (JSONL-файл с запросами к /v1/chat/completions)
+class OpenAIBatchBackend:
+    def __init__(self, client, completion_window="24h"):
+        self.client = client
+        self.completion_window = completion_window
+
+    def submit(self, requests):
+        payload = "\n".join(json.dumps(r, ensure_ascii=False) for r in requests).encode('utf-8')
+        batch_file = self.client.files.create(file=("batch.jsonl", payload), purpose="batch")
+        batch = self.client.batches.create(
+            input_file_id=batch_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window=self.completion_window,
+        )
+        return batch.id
+
+    def status(self, batch_id):
+        return self.client.batches.retrieve(batch_id).status
+
+    def results(self, batch_id):
+        batch = self.client.batches.retrieve(batch_id)
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if not file_id:
+                continue
+            for line in self.client.files.content(file_id).text.splitlines():
+                if line.strip():
+                    yield json.loads(line)
+
+
+# Локальная замена Batch API для тестов и бенчмарков (см. benchmarks/bench_pipeline.py --batch):
+# ответы формирует функция responder(body), первые failed_jobs заданий завершаются со статусом failed,
+# следующие expired_jobs - со статусом expired и ответами только на первую половину запросов
+class FakeBatchBackend:
+    def __init__(self, responder, polls_until_done=1, failed_jobs=0, expired_jobs=0):
+        self.responder = responder
+        self.polls_until_done = polls_until_done
+        self.failed_jobs = failed_jobs
+        self.expired_jobs = expired_jobs
+        self.jobs = {}
+
+    def submit(self, requests):
+        batch_id = f"fake_batch_{len(self.jobs) + 1}"
+        if len(self.jobs) < self.failed_jobs:
+            final_status = "failed"
+        elif len(self.jobs) < self.failed_jobs + self.expired_jobs:
+            final_status = "expired"
+        else:
+            final_status = "completed"
+        self.jobs[batch_id] = {'requests': list(requests), 'polls': 0, 'final_status': final_status}
+        return batch_id
+
+    def status(self, batch_id):
+        job = self.jobs[batch_id]
+        job['polls'] += 1
+        if job['polls'] < self.polls_until_done:
+            return "in_progress"
+        return job['final_status']
+
+    def results(self, batch_id):
+        job = self.jobs[batch_id]
+        if job['final_status'] == "failed":
+            return
+        requests = job['requests']
+        if job['final_status'] == "expired":
+            requests = requests[:len(requests) // 2]
+        for request in requests:
+            yield {
+                "custom_id": request["custom_id"],
+                "response": {
+                    "status_code": 200,
+                    "body": {"choices": [{
+                        "message": {"role": "assistant", "content": self.responder(request["body"])},
+                        "finish_reason": "stop",
+                    }]},
+                },
+                "error": None,
+            }
+
+
+# Отправка накопившихся статей пакетом и идемпотентный приём результатов по data_key
+class BatchProcessor:
+    def __init__(self, store, backend, build_request, parse_result, today):
+        self.store = store
+        self.backend = backend
+        self.build_request = build_request  # (title, full_text) -> тело запроса chat.completions
+        self.parse_result = parse_result  # (item, body) -> (translated_title, summary, summary_en)
+        self.today = today  # () -> дата публикации для сохраняемых статей
+
+    # articles: словари с data_key, title, post_url, full_text и необязательными source, fingerprint, seen_at
+    def submit(self, articles):
+        if not articles:
+            return None
+        requests = [
+            {
+                "custom_id": article['data_key'],
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": self.build_request(article['title'], article['full_text']),
+            }
+            for article in articles
+        ]
+        batch_id = self.backend.submit(requests)
+        self.store.add_batch_items(batch_id, articles)
+        logging.info(f"Отправлено пакетное задание {batch_id}: {len(articles)} статей.")
+        return batch_id
+
+    # Проверяет открытые задания и сохраняет готовые результаты; возвращает число новых статей
+    def poll(self):
+        ingested = 0
+        for batch_id in self.store.open_batches():
+            try:
+                status = self.backend.status(batch_id)
+            except Exception as e:
+                logging.error(f"Ошибка проверки пакетного задания {batch_id}: {e}")
+                continue
+            if status in ACTIVE_STATUSES:
+                logging.info(f"Пакетное задание {batch_id} ещё выполняется ({status}).")
+                continue
+
+            items = self.store.get_batch_items(batch_id)
+            if status != "completed":
+                logging.warning(f"Пакетное задание {batch_id} завершилось со статусом {status}, "
+                                f"необработанные статьи будут отправлены повторно.")
+            if status in RESULT_STATUSES:
+                try:
+                    ingested += self._ingest(batch_id, items)
+                except Exception as e:
+                    logging.error(f"Ошибка чтения результатов пакетного задания {batch_id}: {e}")
+                    continue
+
+            # Необработанные статьи снова попадут в очередь при следующем цикле
+            self.store.remove_batch(batch_id)
+        return ingested
+
+    def _ingest(self, batch_id, items):
+        ingested = 0
+        for line in self.backend.results(batch_id):
+            item = items.get(line.get("custom_id"))
+            if not item:
+                continue
+            response = line.get("response") or {}
+            if line.get("error") or response.get("status_code") != 200:
+                logging.warning(f"Ошибка в пакетном ответе для {item['post_url']}: {line.get('error') or response.get('status_code')}")
+                continue
+            try:
+                translated_title, summary, summary_en = self.parse_result(item, response["body"])
+            except Exception as e:
+                logging.warning(f"Некорректный пакетный ответ для {item['post_url']}: {e}")
+                continue
+            if self.store.add_article(item['data_key'], item['title'], translated_title, summary, item['post_url'],
+                                      self.today(), item['source'], item['fingerprint'], summary_en=summary_en,
+                                      seen_at=item['seen_at']):
+                logging.info(f"Добавлена новость из пакета: {item['title']} (перевод: {translated_title})")
+                ingested += 1
+        logging.info(f"Пакетное задание {batch_id}: сохранено {ingested} из {len(items)} статей.")
+        return ingested
+
+    # Ожидание завершения всех открытых заданий
+    def wait(self, poll_interval=60, timeout=24 * 3600):
+        deadline = time.monotonic() + timeout
+        ingested = self.poll()
+        while self.store.open_batches() and time.monotonic() < deadline:
+            time.sleep(poll_interval)
+            ingested += self.poll()
+        return ingested
@@ -0,0 +1,128 @@
+"""Сравнение извлечения текста: прежний путь BeautifulSoup против extractors.
+
+Запуск: python benchmarks/bench_extract.py [файлы.html ...]
+По умолчанию используются синтетические страницы из benchmarks/fixtures: разметка повторяет тему
+climaterealism.com (шапка, боковая колонка, комментарии), тексты условные. Для оценки на настоящих
+страницах передайте сохранённые HTML-файлы.
+Память - прирост пикового RSS процесса при разборе страницы. Он замеряется в отдельном процессе
+для каждого пути, чтобы учесть память libxml2 и lexbor, которую не видит tracemalloc.
+"""
+import argparse
+import glob
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from budget import count_tokens  # noqa: E402
+from extractors import EXTRACTORS  # noqa: E402
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+ARTICLE_URL = "https://climaterealism.com/2024/10/article/"
+WARM_UP_HTML = b"<html><body><article><p>warm-up</p></article></body></html>"
+
+
+# Прежний путь из fetch_full_text: все <p> внутри <body>
+def baseline_article(html):
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, "html.parser")
+    body = soup.find('body')
+    return [p.get_text(strip=True) for p in body.find_all('p')] if body else []
+
+
+# Пути извлечения: имя, подпись в таблице и функция html -> абзацы
+def candidates():
+    result = [("baseline", "bs4 html.parser (прежний путь)", baseline_article)]
+    for name, extractor_class in EXTRACTORS.items():
+        try:
+            extractor = extractor_class()
+        except ImportError:
+            print(f"{name}: не установлен, пропуск", file=sys.stderr)
+            continue
+        result.append((name, f"extractors.{name}", lambda html, e=extractor: e.article(html, ARTICLE_URL)))
+    return result
+
+
+def measure_time(func, html, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(html)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings), result
+
+
+def proc_status_kb(field):
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1])
+    raise KeyError(field)
+
+
+# Сбрасывает пик RSS процесса (Linux, /proc/self/clear_refs) и возвращает исходный уровень, КБ.
+# Без /proc прирост считается от пика по getrusage и может быть занижен
+def reset_peak_rss():
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return proc_status_kb("VmRSS")
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def peak_rss_kb():
+    try:
+        return proc_status_kb("VmHWM")
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+# Замер в дочернем процессе: библиотеки парсера загружаются разбором маленькой страницы,
+# затем печатается прирост пикового RSS при разборе файла
+def rss_child(name, path):
+    func = {key: func for key, _, func in candidates()}[name]
+    with open(path, 'rb') as f:
+        html = f.read()
+    func(WARM_UP_HTML)
+    before = reset_peak_rss()
+    func(html)
+    print(peak_rss_kb() - before)
+
+
+def measure_rss(name, path):
+    output = subprocess.run([sys.executable, os.path.abspath(__file__), "--rss-child", name, path],
+                            capture_output=True, text=True, check=True).stdout
+    return int(output.strip())
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("files", nargs="*", help="HTML-страницы статей")
+    arg_parser.add_argument("--repeat", type=int, default=20)
+    arg_parser.add_argument("--rss-child", help=argparse.SUPPRESS)
+    args = arg_parser.parse_args()
+    if args.rss_child:
+        rss_child(args.rss_child, args.files[0])
+        return
+    files = args.files or sorted(glob.glob(os.path.join(FIXTURES, "article*.html")))
+
+    entries = candidates()
+    print(f"{'файл':<20} {'путь':<32} {'время, мс':>10} {'пик RSS, КБ':>12} {'абзацев':>8} {'токенов':>8}")
+    for path in files:
+        with open(path, 'rb') as f:
+            html = f.read()
+        for name, label, func in entries:
+            elapsed, paragraphs = measure_time(func, html, args.repeat)
+            rss = measure_rss(name, path)
+            tokens = count_tokens("\n".join(paragraphs))
+            print(f"{os.path.basename(path):<20} {label:<32} {elapsed * 1000:>10.2f} {rss:>12} "
+                  f"{len(paragraphs):>8} {tokens:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Проверка индекса почти-дубликатов на синтетическом корпусе статей.
+
+Запуск: python benchmarks/bench_neardup.py [--articles 3000] [--threshold 0.7]
+Часть статей публикуется повторно с правками (замена слов, служебные абзацы),
+индекс должен находить такие копии и не путать разные статьи.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from neardup import NearDuplicateIndex  # noqa: E402
+
+BOILERPLATE = [
+    "This article originally appeared at another outlet and is republished here with permission.",
+    "Share this article with your friends and subscribe to our newsletter for more.",
+]
+
+
+def make_article(rng, vocabulary, words=400):
+    return " ".join(rng.choice(vocabulary) for _ in range(words))
+
+
+# Копия статьи: часть слов заменена, добавлены служебные абзацы
+def make_variant(rng, text, vocabulary, edit_rate):
+    words = text.split()
+    for i in range(len(words)):
+        if rng.random() < edit_rate:
+            words[i] = rng.choice(vocabulary)
+    return rng.choice(BOILERPLATE) + "\n" + " ".join(words) + "\n" + rng.choice(BOILERPLATE)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--articles", type=int, default=3000)
+    arg_parser.add_argument("--duplicate-share", type=float, default=0.2)
+    arg_parser.add_argument("--edit-rate", type=float, default=0.02)
+    arg_parser.add_argument("--threshold", type=float, default=0.7)
+    arg_parser.add_argument("--num-perm", type=int, default=128)
+    arg_parser.add_argument("--seed", type=int, default=42)
+    args = arg_parser.parse_args()
+
+    rng = random.Random(args.seed)
+    vocabulary = [f"w{i}" for i in range(5000)]
+    originals = [make_article(rng, vocabulary) for _ in range(args.articles)]
+    variants = [
+        (index, make_variant(rng, originals[index], vocabulary, args.edit_rate))
+        for index in rng.sample(range(args.articles), int(args.articles * args.duplicate_share))
+    ]
+
+    with tempfile.TemporaryDirectory() as directory:
+        index = NearDuplicateIndex(os.path.join(directory, "neardup.db"), threshold=args.threshold,
+                                   num_perm=args.num_perm)
+        print(f"Статей: {args.articles}, копий: {len(variants)}, порог: {args.threshold}, "
+              f"полос LSH: {index.bands} x {index.rows}")
+
+        start = time.perf_counter()
+        signatures = [index.signature(text) for text in originals]
+        signature_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        false_positives = 0
+        for number, signature in enumerate(signatures):
+            if index.query(signature):
+                false_positives += 1
+            index.add(f"a{number}", signature)
+        build_time = time.perf_counter() - start
+
+        latencies = []
+        found = 0
+        for original, text in variants:
+            start = time.perf_counter()
+            match = index.query(index.signature(text))
+            latencies.append(time.perf_counter() - start)
+            if match and match[0] == f"a{original}":
+                found += 1
+
+    print(f"Подписи: {signature_time / args.articles * 1000:.2f} мс на статью")
+    print(f"Заполнение индекса (запрос + вставка): {build_time / args.articles * 1000:.2f} мс на статью")
+    print(f"Поиск копии (подпись + запрос): медиана {statistics.median(latencies) * 1000:.2f} мс, "
+          f"максимум {max(latencies) * 1000:.2f} мс")
+    print(f"Найдено копий: {found}/{len(variants)} ({found / max(1, len(variants)):.1%}), "
+          f"ложных совпадений среди оригиналов: {false_positives}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,323 @@
+"""Сквозной замер цикла бота без сети: сайт, OpenAI и Telegram заменены страницами из fixtures и заглушками.
+
+Запуск: python benchmarks/bench_pipeline.py [--articles 100] [--llm-latency 2] [--llm-429-rate 0.05] ...
+Страницы берутся из benchmarks/fixtures (синтетические listing.html и article*.html) или из --fixtures.
+Выполняется NewsBot.publish_news() с настоящим конвейером, хранилищем и очередью доставки во временном
+каталоге; цикл считается завершённым, когда все сообщения доставлены. Для сравнения изменений
+запускайте с одинаковым --seed и сохраняйте результат через --json.
+
+С --batch новые статьи уходят пакетным заданием в batch.FakeBatchBackend: задание отправляется в одном
+цикле, а результаты сохраняются и публикуются в следующем. --batch-failed-jobs N завершает первые N
+заданий со статусом failed; их статьи должны быть отправлены повторно, поэтому нужно --cycles не меньше N + 2.
+--batch-expired-jobs M завершает следующие M заданий со статусом expired: результаты первой половины статей
+сохраняются, остальные статьи отправляются в новом задании.
+"""
+import argparse
+import glob
+import json
+import os
+import random
+import resource
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import types
+import zlib
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES = os.path.join(ROOT, "benchmarks", "fixtures")
+LISTING_URL = "https://climaterealism.com/"
+
+sys.path.insert(0, ROOT)
+
+
+class FakeResponse:
+    def __init__(self, status_code, content=b"", headers=None):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+
+    @property
+    def text(self):
+        return self.content.decode("utf-8", errors="replace")
+
+    def iter_content(self, chunk_size=1):
+        for start in range(0, len(self.content), chunk_size):
+            yield self.content[start:start + chunk_size]
+
+    def close(self):
+        pass
+
+
+# Сайт из записанных страниц: лента отсутствует (404), список статей и статьи отдаются с задержкой,
+# доля ответов error_rate - 503
+class FakeSite:
+    def __init__(self, listing, articles, latency, error_rate, rng):
+        self.listing = listing
+        self.articles = articles
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rng = rng
+        self.lock = threading.Lock()
+        self.errors = 0
+
+    def get(self, url, headers=None, timeout=None, **kwargs):
+        with self.lock:
+            delay = self.rng.uniform(0.5, 1.5) * self.latency
+            failed = self.rng.random() < self.error_rate
+            self.errors += failed
+        time.sleep(delay)
+        if failed:
+            return FakeResponse(503)
+        if url.endswith("/feed/"):
+            return FakeResponse(404)
+        if url == LISTING_URL:
+            return FakeResponse(200, self.listing, {"ETag": '"listing"'})
+        # Адрес вставляется в текст, чтобы статьи не совпадали по отпечатку содержимого
+        page = self.articles[zlib.crc32(url.encode("utf-8")) % len(self.articles)]
+        return FakeResponse(200, page.replace(b"<p>", b"<p>" + url.encode("utf-8") + b" ", 1), {"ETag": '"article"'})
+
+
+def build_listing(count):
+    links = "\n".join(
+        f'<h3 class="entry-title td-module-title"><a href="{LISTING_URL}2024/10/bench-{number}/" '
+        f'rel="bookmark">Benchmark article {number}</a></h3>'
+        for number in range(count)
+    )
+    return f"<html><body><div class=\"td-main-content\">{links}</div></body></html>".encode("utf-8")
+
+
+# Ответ 429 от OpenAI без HTTP-ответа: news_parser.py различает ошибки только по типу
+def rate_limit_error():
+    import openai
+
+    class BenchRateLimitError(openai.RateLimitError):
+        def __init__(self):
+            Exception.__init__(self, "Rate limit reached (benchmark)")
+
+    return BenchRateLimitError()
+
+
+# Заглушка OpenAI: ответы в формате промптов news_parser.py, задержка и доля ответов 429
+class FakeLLM:
+    def __init__(self, latency, rate_limit_share, rng):
+        self.latency = latency
+        self.rate_limit_share = rate_limit_share
+        self.rng = rng
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.rate_limited = 0
+
+    def create(self, **request):
+        with self.lock:
+            self.calls += 1
+            delay = self.rng.uniform(0.5, 1.5) * self.latency
+            limited = self.rng.random() < self.rate_limit_share
+            if limited:
+                self.rate_limited += 1
+        time.sleep(delay)
+        if limited:
+            raise rate_limit_error()
+
+        prompt = request["messages"][0]["content"]
+        if "response_format" in request:
+            content = json.dumps({"translated_title": "Заголовок", "summary_ru": "Выжимка " * 80}, ensure_ascii=False)
+        elif "Переведите" in prompt:
+            content = "1. Переведенный заголовок: Заголовок\n2. Переведенная выжимка: " + "Выжимка " * 80
+        elif "Выжимка статьи:" in prompt:
+            content = "Выжимка статьи: " + "summary " * 80
+        else:
+            content = "notes " * 60
+        message = types.SimpleNamespace(content=content, refusal=None)
+        usage = types.SimpleNamespace(prompt_tokens=len(prompt) // 4, completion_tokens=len(content) // 4)
+        return types.SimpleNamespace(choices=[types.SimpleNamespace(message=message, finish_reason="stop")],
+                                     usage=usage)
+
+
+# Ответ пакетного задания в формате structured_request
+def batch_responder(body):
+    return json.dumps({"translated_title": "Заголовок", "summary_ru": "Выжимка " * 80}, ensure_ascii=False)
+
+
+# Заглушка Telegram: задержка отправки и доля ответов 429 с retry_after
+class FakeTelegram:
+    def __init__(self, latency, rate_limit_share, retry_after, rng):
+        self.latency = latency
+        self.rate_limit_share = rate_limit_share
+        self.retry_after = retry_after
+        self.rng = rng
+        self.lock = threading.Lock()
+        self.sent = 0
+        self.rate_limited = 0
+
+    def send(self, chat_id, payload):
+        from delivery import RetryAfter
+
+        with self.lock:
+            delay = self.rng.uniform(0.5, 1.5) * self.latency
+            limited = self.rng.random() < self.rate_limit_share
+        time.sleep(delay)
+        with self.lock:
+            if limited:
+                self.rate_limited += 1
+            else:
+                self.sent += 1
+        if limited:
+            raise RetryAfter(self.retry_after)
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def histogram_deltas(before, after):
+    rows = []
+    for key, value in after.items():
+        if not isinstance(value, tuple):
+            continue
+        count, total = value[0] - before.get(key, (0, 0.0))[0], value[1] - before.get(key, (0, 0.0))[1]
+        if count:
+            name, labels = key
+            label = ",".join(f"{k}={v}" for k, v in labels)
+            rows.append((f"{name}{{{label}}}" if label else name, count, total))
+    return sorted(rows)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--fixtures", default=FIXTURES, help="каталог с listing.html и article*.html")
+    arg_parser.add_argument("--articles", type=int, default=0, help="число статей в списке (0 - как в listing.html)")
+    arg_parser.add_argument("--cycles", type=int, default=2, help="циклов подряд; со второго статьи уже известны")
+    arg_parser.add_argument("--chats", type=int, default=2)
+    arg_parser.add_argument("--http-latency", type=float, default=0.05)
+    arg_parser.add_argument("--http-error-rate", type=float, default=0.0, help="доля ответов 503 от сайта")
+    arg_parser.add_argument("--llm-latency", type=float, default=0.5)
+    arg_parser.add_argument("--llm-429-rate", type=float, default=0.0)
+    arg_parser.add_argument("--telegram-latency", type=float, default=0.05)
+    arg_parser.add_argument("--telegram-429-rate", type=float, default=0.0)
+    arg_parser.add_argument("--telegram-retry-after", type=float, default=1.0)
+    arg_parser.add_argument("--real-telegram-limits", action="store_true",
+                            help="оставить лимиты Telegram из bot.py (20 сообщений в минуту на чат)")
+    arg_parser.add_argument("--summary-mode", default="chain", choices=["chain", "structured"])
+    arg_parser.add_argument("--html-parser", default="auto")
+    arg_parser.add_argument("--batch", action="store_true", help="обрабатывать статьи пакетными заданиями")
+    arg_parser.add_argument("--batch-failed-jobs", type=int, default=0,
+                            help="сколько первых пакетных заданий завершатся ошибкой")
+    arg_parser.add_argument("--batch-expired-jobs", type=int, default=0,
+                            help="сколько следующих пакетных заданий истекут, выполнив половину запросов")
+    arg_parser.add_argument("--neardup-threshold", default="0",
+                            help="порог почти-дубликатов; по умолчанию выключен, статьи отличаются только адресом")
+    arg_parser.add_argument("--timeout", type=float, default=600, help="предел ожидания доставки за цикл, с")
+    arg_parser.add_argument("--seed", type=int, default=42)
+    arg_parser.add_argument("--log-level", default="WARNING")
+    arg_parser.add_argument("--json", help="сохранить результаты в JSON-файл")
+    args = arg_parser.parse_args()
+
+    listing = open(os.path.join(args.fixtures, "listing.html"), "rb").read()
+    if args.articles:
+        listing = build_listing(args.articles)
+    articles = [open(path, "rb").read() for path in sorted(glob.glob(os.path.join(args.fixtures, "article*.html")))]
+    if not articles:
+        sys.exit(f"В {args.fixtures} нет файлов article*.html")
+
+    json_path = os.path.abspath(args.json) if args.json else None
+    workdir = tempfile.mkdtemp(prefix="bench_pipeline_")
+    os.chdir(workdir)  # журнал, базы и каталог error_pages создаются во временном каталоге
+    os.environ.update({
+        "NEWS_DB": os.path.join(workdir, "news.db"),
+        "LLM_CACHE_DB": os.path.join(workdir, "llm_cache.db"),
+        "SOURCES_FILE": os.path.join(workdir, "sources.json"),
+        "SUMMARY_MODE": args.summary_mode,
+        "HTML_PARSER": args.html_parser,
+        "NEARDUP_THRESHOLD": args.neardup_threshold,
+        "PARSER_REQUESTS_PER_SECOND": "1000",
+        "PARSER_REQUESTS_BURST": "1000",
+        "BACKLOG_THRESHOLD": "1" if args.batch else "0",
+    })
+
+    import metrics
+    from batch import BatchProcessor, FakeBatchBackend
+    from bot import NewsBot
+    from context import setup_logging
+    from news_parser import app, parse_batch_result, structured_request
+
+    setup_logging(os.path.join(workdir, "bench.log"), args.log_level)
+
+    rng = random.Random(args.seed)
+    site = FakeSite(listing, articles, args.http_latency, args.http_error_rate, rng)
+    llm = FakeLLM(args.llm_latency, args.llm_429_rate, rng)
+    telegram = FakeTelegram(args.telegram_latency, args.telegram_429_rate, args.telegram_retry_after, rng)
+    app.scraper = site
+    app.openai = types.SimpleNamespace(chat=types.SimpleNamespace(completions=types.SimpleNamespace(create=llm.create)))
+    batch_backend = FakeBatchBackend(batch_responder, failed_jobs=args.batch_failed_jobs,
+                                     expired_jobs=args.batch_expired_jobs)
+    app.batch_processor = BatchProcessor(app.store, batch_backend, structured_request, parse_batch_result, app.today)
+    news_bot = NewsBot(app, "0:bench", [str(-1000 - number) for number in range(args.chats)])
+    news_bot.delivery_worker.send = telegram.send
+    if not args.real_telegram_limits:
+        for bucket in [news_bot.delivery_worker.global_bucket] + list(news_bot.delivery_worker.chat_buckets.values()):
+            bucket.rate = bucket.capacity = bucket.tokens = 10000
+
+    news_bot.delivery_worker.start()
+    news_bot.article_pipeline.start()
+
+    results = []
+    for cycle in range(1, args.cycles + 1):
+        for source in app.source_registry.sources:
+            app.source_registry.next_poll[source.name] = 0.0
+        before = metrics.REGISTRY.snapshot()
+        stored_before = app.store.last_offset()
+        sent_before = telegram.sent
+
+        start = time.perf_counter()
+        news_bot.publish_news()
+        news_bot.article_pipeline.join()
+        processed = time.perf_counter() - start
+        while app.store.pending_deliveries() and time.perf_counter() - start < args.timeout:
+            time.sleep(0.05)
+        elapsed = time.perf_counter() - start
+
+        stored = app.store.last_offset() - stored_before
+        stages = histogram_deltas(before, metrics.REGISTRY.snapshot())
+        results.append({
+            "cycle": cycle,
+            "seconds": round(elapsed, 3),
+            "processing_seconds": round(processed, 3),
+            "articles": stored,
+            "articles_per_second": round(stored / elapsed, 3) if elapsed else 0,
+            "messages_sent": telegram.sent - sent_before,
+            "pending_deliveries": app.store.pending_deliveries(),
+            "peak_rss_mb": round(peak_rss_mb(), 1),
+            "stages": [{"name": name, "count": count, "seconds": round(total, 3)} for name, count, total in stages],
+        })
+
+        print(f"Цикл {cycle}: {elapsed:.2f} с (конвейер {processed:.2f} с), статей {stored}, "
+              f"{stored / elapsed if elapsed else 0:.2f} статей/с, отправлено сообщений "
+              f"{telegram.sent - sent_before}, в очереди {app.store.pending_deliveries()}, "
+              f"пик RSS {peak_rss_mb():.1f} МБ")
+        for name, count, total in stages:
+            print(f"  {name:<60} {count:>6} шт. {total:>9.2f} с  {total / count * 1000:>9.1f} мс")
+
+    print(f"Ответов сайта 503: {site.errors}; запросов к LLM: {llm.calls}, из них 429: {llm.rate_limited}; "
+          f"ответов Telegram 429: {telegram.rate_limited}")
+    if args.batch:
+        print(f"Пакетных заданий: {len(batch_backend.jobs)}, незавершённых: {len(app.store.open_batches())}, "
+              f"сохранено статей: {app.store.last_offset()}")
+
+    if json_path:
+        report = {"args": vars(args), "cycles": results, "http_errors": site.errors, "llm_calls": llm.calls,
+                  "llm_rate_limited": llm.rate_limited, "telegram_rate_limited": telegram.rate_limited,
+                  "batch_jobs": len(batch_backend.jobs)}
+        with open(json_path, "w", encoding="utf-8") as file:
+            json.dump(report, file, ensure_ascii=False, indent=2)
+
+    news_bot.delivery_worker.stop()
+    news_bot.article_pipeline.stop()
+    os.chdir(ROOT)
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
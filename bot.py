@@ -1,171 +1,220 @@
-import telebot
-from telebot.types import InlineKeyboardMarkup, InlineKeyboardButton
-import csv
-from datetime import datetime
-from parser import fetch_news
+from news_parser import app, clean_old_entries, create_pipeline, fetch_news
+from context import setup_logging
+from delivery import DeliveryWorker, PermanentError, RetryAfter
+from metrics import MetricsServer
 from dotenv import load_dotenv
 import os
-import time
-import schedule
+import threading
 import logging
 
-# Настройка логирования
-logging.basicConfig(
-    level=logging.DEBUG,  # Установите уровень на DEBUG для подробных логов
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler("bot.log", encoding='utf-8'),
-        logging.StreamHandler()
-    ]
-)
-
-# Загрузка токена бота из .env
-load_dotenv()
-TOKEN = os.getenv("BOT_TOKEN")
-GROUP_ID = os.getenv("GROUP_ID")  # ID Telegram-группы, куда отправлять новости
-
-# Проверка загрузки переменных
-if not TOKEN or not GROUP_ID:
-    logging.error("BOT_TOKEN или GROUP_ID не установлены в .env файле.")
-    exit(1)
-else:
-    logging.info("BOT_TOKEN и GROUP_ID успешно загружены.")
+# Ключ в meta, где хранится позиция бота в журнале статей
+PUBLISH_OFFSET_KEY = "publish_offset"
+
+
+# Бот публикации новостей: конвейер обработки статей, очередь доставки и клиент Telegram
+class NewsBot:
+    def __init__(self, app, token, group_ids):
+        import telebot
+
+        self.app = app
+        self.store = app.store
+        self.bot = telebot.TeleBot(token)
+        self.group_ids = group_ids
+
+        # Очередь доставки: лимиты Telegram - около 30 сообщений в секунду на бота и 20 в минуту на группу
+        self.delivery_worker = DeliveryWorker(
+            self.store,
+            self.send_news,
+            group_ids,
+            global_rate=float(os.getenv("TELEGRAM_GLOBAL_RATE", "30")),
+            chat_rate=float(os.getenv("TELEGRAM_CHAT_RATE_PER_MINUTE", "20")) / 60,
+            backoff_max=float(os.getenv("TELEGRAM_BACKOFF_MAX", "600")),
+        )
+
+        # Конвейер обработки статей: загрузка, выжимка и публикация идут параллельно по стадиям
+        self.article_pipeline = create_pipeline(publish=self.publish_article)
+
+        # Проверки новостей не пересекаются; wake прерывает ожидание до следующей проверки
+        self.poll_lock = threading.Lock()
+        self.wake = threading.Event()
+
+        # Дата последней очистки хранилища; очистка выполняется раз в сутки при смене даты
+        self.cleaned_on = None
 
-bot = telebot.TeleBot(TOKEN)
-
-# CSV файл с новостями
-csv_file = 'news.csv'
-sent_news_file = 'sent_news.txt'  # Файл для хранения отправленных data_key
-
-# Загружаем уже отправленные новости
-if os.path.exists(sent_news_file):
-    try:
-        with open(sent_news_file, 'r', encoding='utf-8') as f:
-            sent_news = set(line.strip() for line in f if line.strip())
-        logging.info(f"Загружено {len(sent_news)} отправленных новостей.")
-    except Exception as e:
-        logging.error(f"Ошибка чтения {sent_news_file}: {e}")
-        sent_news = set()
-else:
-    sent_news = set()
-    logging.info("Файл sent_news.txt не найден. Начинаем с пустого набора отправленных новостей.")
-
-# Функция отправки новостей в группу
-def publish_news():
-    global sent_news
-
-    logging.info("🔄 Начало проверки обновлений новостей...")
-
-    try:
-        logging.debug("🔍 Получение новых новостей...")
-        fetch_news()
-        logging.info("🔍 Новые новости получены.")
-    except Exception as e:
-        logging.error(f"Ошибка при получении новостей: {e}")
-        return
-
-    # Считываем все новости из CSV и отправляем те, которые еще не были отправлены
-    new_news = []
-    try:
-        with open(csv_file, 'r', encoding='utf-8') as file:
-            reader = csv.DictReader(file)
-            for row in reader:
-                logging.debug(f"Обрабатываем статью: {row['title']} ({row['parsed_date']})")
-                if row['data_key'] not in sent_news:
-                    new_news.append(row)
-    except Exception as e:
-        logging.error(f"Ошибка чтения {csv_file}: {e}")
-        return
-
-    logging.info(f"Новых новостей для отправки: {len(new_news)}")
-
-    if not new_news:
-        logging.info("✅ Новых новостей нет.")
-        return
-
-    # Отправляем новые новости в группу
-    for news in new_news:
+        # Пользователи Telegram, которым доступна команда /poll (ADMIN_IDS через запятую)
+        self.admin_ids = {int(user_id) for user_id in os.getenv("ADMIN_IDS", "").split(",") if user_id.strip()}
+
+    # Функция постановки статьи в очередь доставки; отправку ведёт delivery_worker
+    def publish_article(self, news):
         translated_title = news['translated_title']
         summary = news['summary']
         post_url = news['post_url']
 
+        # Формируем текст сообщения с использованием HTML
+        message_text = f"📰 <b>{translated_title}</b>\n\n{summary}\n\n<a href='{post_url}'>Читать оригинал</a>"
+        if len(message_text) > 4096:
+            message_text = message_text[:4093] + "..."
+
+        try:
+            self.delivery_worker.enqueue(news['data_key'], {'title': translated_title, 'text': message_text, 'post_url': post_url})
+            logging.debug(f"Новость поставлена в очередь доставки: {translated_title}")
+            return True
+        except Exception as e:
+            logging.error(f"❌ Ошибка постановки новости '{translated_title}' в очередь: {e}")
+            return False
+
+    # Функция проверки новостей: источники, которым пора, опрашиваются, новые статьи уходят в конвейер
+    # и публикуются по мере готовности
+    def publish_news(self):
+        polled = 0
+        try:
+            polled = fetch_news(pipeline=self.article_pipeline, force=False)
+        except Exception as e:
+            logging.error(f"Ошибка при получении новостей: {e}")
+        if polled:
+            logging.info(f"🔍 Опрошено источников: {polled}.")
+
+        # Дочитываем журнал статей с сохранённой позиции при каждой проверке, даже если ни один источник
+        # не опрашивался: так сразу публикуются статьи, сохранённые в обход конвейера (например, из пакетных
+        # заданий, результаты которых fetch_news забирает в начале). Позиция сдвигается только после
+        # постановки в очередь
+        start = offset = int(self.store.get_meta(PUBLISH_OFFSET_KEY, "0"))
+        published = 0
+        try:
+            end = self.store.last_offset()
+            for news in self.store.read_articles(offset, unsent_only=True):
+                if not self.publish_article(news):
+                    break
+                offset = news['seq']
+                published += 1
+            else:
+                offset = max(offset, end)
+        except Exception as e:
+            logging.error(f"Ошибка чтения хранилища новостей: {e}")
+        if offset != start:
+            self.store.set_meta(PUBLISH_OFFSET_KEY, str(offset))
+
+        if polled or published:
+            logging.info(f"Из журнала статей поставлено в очередь: {published}. ✅ Ожидают отправки: {self.store.pending_deliveries()}.")
+
+        # Очистка после чтения журнала, чтобы вчерашние статьи успели попасть в очередь доставки
+        today = self.app.today()
+        if today != self.cleaned_on:
+            clean_old_entries()
+            self.cleaned_on = today
+
+    # Запуск задачи в отдельном потоке, чтобы не блокировать цикл планировщика; проверки не пересекаются
+    def run_in_background(self, job):
+        def runner():
+            if not self.poll_lock.acquire(blocking=False):
+                logging.info("Предыдущая проверка новостей ещё выполняется, пропуск.")
+                return
+            try:
+                job()
+            finally:
+                self.poll_lock.release()
+        threading.Thread(target=runner, name=job.__name__, daemon=True).start()
+
+    # Внеочередная проверка: все источники опрашиваются сразу, не дожидаясь своего интервала
+    def trigger(self):
+        self.app.source_registry.make_due()
+        self.wake.set()
+        logging.info("Запрошена внеочередная проверка новостей.")
+
+    # Команда /poll для администраторов из ADMIN_IDS
+    def handle_poll_command(self, message):
+        if message.from_user is None or message.from_user.id not in self.admin_ids:
+            return
+        self.trigger()
+        self.bot.reply_to(message, "🔄 Проверка новостей запущена.")
+
+    # Функция отправки одного сообщения; при 429 бросает RetryAfter для планировщика очереди,
+    # при других ответах 4xx (чат недоступен, некорректное сообщение) - PermanentError
+    def send_news(self, chat_id, payload):
+        import telebot
+        from telebot.types import InlineKeyboardMarkup, InlineKeyboardButton
+
         # Создаем кнопку для открытия оригинала статьи
         markup = InlineKeyboardMarkup()
         webapp_button = InlineKeyboardButton(
             text="🔗 Оригинал статьи",
-            url=post_url
+            url=payload['post_url']
         )
         markup.add(webapp_button)
 
-        # Формируем текст сообщения с использованием HTML
-        message_text = f"📰 <b>{translated_title}</b>\n\n{summary}\n\n<a href='{post_url}'>Читать оригинал</a>"
-        if len(message_text) > 4096:
-            message_text = message_text[:4093] + "..."
-
         try:
-            logging.debug(f"Попытка отправки новости: {translated_title}")
-            bot.send_message(
-                GROUP_ID,
-                message_text,
+            self.bot.send_message(
+                chat_id,
+                payload['text'],
                 parse_mode='HTML',
                 disable_web_page_preview=False,
                 reply_markup=markup
             )
-            logging.info(f"✅ Новость отправлена: {translated_title}")
-            sent_news.add(news['data_key'])  # Добавляем только после успешной отправки
-
-            # Сохраняем `sent_news.txt` сразу после отправки
-            with open(sent_news_file, 'a', encoding='utf-8') as f:
-                f.write(f"{news['data_key']}\n")
-            logging.debug(f"Добавлен data_key в sent_news.txt: {news['data_key']}")
-
         except telebot.apihelper.ApiException as api_err:
-            if api_err.result.status_code == 429:
-                retry_after = int(api_err.result.json().get('parameters', {}).get('retry_after', 1))
-                logging.error(f"❌ API ошибка 429: Too Many Requests. Повторная попытка через {retry_after} секунд.")
-                time.sleep(retry_after)
-                # Повторная попытка отправки сообщения
-                try:
-                    bot.send_message(
-                        GROUP_ID,
-                        message_text,
-                        parse_mode='HTML',
-                        disable_web_page_preview=False,
-                        reply_markup=markup
-                    )
-                    logging.info(f"✅ Новость отправлена после ожидания: {translated_title}")
-                    sent_news.add(news['data_key'])
-                    with open(sent_news_file, 'a', encoding='utf-8') as f:
-                        f.write(f"{news['data_key']}\n")
-                    logging.debug(f"Добавлен data_key в sent_news.txt после повторной попытки: {news['data_key']}")
-                except Exception as e:
-                    logging.error(f"❌ Не удалось отправить новость после ожидания: {translated_title}. Ошибка: {e}")
-            else:
-                logging.error(f"❌ API ошибка при отправке новости '{translated_title}': {api_err}")
-        except Exception as e:
-            logging.error(f"❌ Неизвестная ошибка при отправке новости '{translated_title}': {e}")
-
-        # Задержка между отправками для предотвращения блокировок
-        time.sleep(3)  # Увеличьте задержку до 3 секунд
+            status = api_err.result.status_code
+            if status == 429:
+                raise RetryAfter(int(api_err.result.json().get('parameters', {}).get('retry_after', 1)))
+            if 400 <= status < 500:
+                raise PermanentError(str(api_err)) from api_err
+            raise
+
+    def run(self):
+        logging.info("🤖 Бот запущен и готов публиковать новости.")
+        # Отправляем тестовое сообщение при запуске
+        for group_id in self.group_ids:
+            try:
+                self.bot.send_message(group_id, "🤖 Бот запущен и начал мониторинг новостей.")
+                logging.info(f"✅ Тестовое сообщение отправлено в чат {group_id}.")
+            except Exception as e:
+                logging.error(f"❌ Ошибка отправки тестового сообщения в чат {group_id}: {e}")
+
+        # Метрики в формате Prometheus на локальном порту (METRICS_PORT=0 отключает)
+        metrics_port = int(os.getenv("METRICS_PORT", "9108"))
+        if metrics_port:
+            try:
+                # POST /poll на этом же порту запускает внеочередную проверку
+                MetricsServer(metrics_port, os.getenv("METRICS_HOST", "127.0.0.1"),
+                              hooks={"/poll": self.trigger}).start()
+            except OSError as e:
+                logging.error(f"Не удалось запустить сервер метрик на порту {metrics_port}: {e}")
+
+        self.delivery_worker.start()
+        self.article_pipeline.start()
+
+        if self.admin_ids:
+            self.bot.register_message_handler(self.handle_poll_command, commands=['poll'])
+            threading.Thread(target=self.bot.infinity_polling, name="telegram-polling", daemon=True).start()
+            logging.info(f"Команда /poll доступна администраторам: {len(self.admin_ids)}.")
+
+        # Проверка запускается, когда подходит срок ближайшего источника (интервалы подбирает
+        # app.poll_schedule), но не реже раза в минуту, или сразу по trigger()
+        logging.info("🔧 Выполнение тестового вызова publish_news()...")
+        while True:
+            self.run_in_background(self.publish_news)
+            timeout = max(1.0, min(60.0, self.app.source_registry.seconds_until_due()))
+            if self.wake.wait(timeout):
+                self.wake.clear()
+
+
+def main():
+    # Загрузка токена бота из .env
+    load_dotenv()
+    setup_logging("bot.log")
+    token = os.getenv("BOT_TOKEN")
+    group_id = os.getenv("GROUP_ID")  # ID Telegram-групп, куда отправлять новости (через запятую)
+    group_ids = [chat_id.strip() for chat_id in (group_id or "").split(",") if chat_id.strip()]
+
+    # Проверка загрузки переменных
+    if not token or not group_ids:
+        logging.error("BOT_TOKEN или GROUP_ID не установлены в .env файле.")
+        exit(1)
+    if not app.settings.openai_api_key:
+        logging.error("OPENAI_API_KEY не установлена в переменных окружения.")
+        exit(1)
+    logging.info("BOT_TOKEN и GROUP_ID успешно загружены.")
 
-    logging.info(f"✅ Сохранены отправленные новости: {len(sent_news)} записей.")
+    NewsBot(app, token, group_ids).run()
 
-# Периодическая проверка новостей
-schedule.every(60).minutes.do(publish_news)
 
 if __name__ == "__main__":
-    logging.info("🤖 Бот запущен и готов публиковать новости.")
-    # Отправляем тестовое сообщение при запуске
-    try:
-        bot.send_message(GROUP_ID, "🤖 Бот запущен и начал мониторинг новостей.")
-        logging.info("✅ Тестовое сообщение отправлено.")
-    except Exception as e:
-        logging.error(f"❌ Ошибка отправки тестового сообщения: {e}")
-
-    # Вызов publish_news() для немедленной проверки
-    logging.info("🔧 Выполнение тестового вызова publish_news()...")
-    publish_news()
-
-    while True:
-        schedule.run_pending()
-        time.sleep(1)
+    main()
@@ -0,0 +1,113 @@
+import re
+
+# Типичные служебные абзацы WordPress-сайтов (кнопки «поделиться», подписка, комментарии)
+BOILERPLATE_PATTERNS = [
+    re.compile(pattern, re.IGNORECASE) for pattern in (
+        r"^share this:?$",
+        r"^like this:?$",
+        r"^loading\.*$",
+        r"^related:?$",
+        r"^leave a reply",
+        r"^click to (share|print|email)",
+        r"^(subscribe|sign up) (to|for) (our|the) newsletter",
+        r"^(originally )?(posted|published) (on|at|by) ",
+        r"^the views expressed .* (do not|don't) necessarily",
+    )
+]
+
+_encoding = None
+
+
+# Количество токенов: tiktoken, если установлен, иначе оценка ~4 символа на токен
+def count_tokens(text):
+    global _encoding
+    if _encoding is None:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("o200k_base")
+        except ImportError:
+            _encoding = False
+    if _encoding:
+        return len(_encoding.encode(text))
+    return (len(text) + 3) // 4
+
+
+def is_boilerplate(paragraph):
+    return any(pattern.search(paragraph) for pattern in BOILERPLATE_PATTERNS)
+
+
+# Удаляет повторяющиеся и служебные абзацы, сохраняя порядок
+def dedupe_paragraphs(paragraphs):
+    seen = set()
+    result = []
+    for paragraph in paragraphs:
+        paragraph = paragraph.strip()
+        key = " ".join(paragraph.lower().split())
+        if not key or key in seen or is_boilerplate(key):
+            continue
+        seen.add(key)
+        result.append(paragraph)
+    return result
+
+
+# Делит абзацы на части не длиннее max_tokens (слишком длинный абзац режется по словам)
+def split_chunks(paragraphs, max_tokens):
+    chunks, current, current_tokens = [], [], 0
+    for paragraph in paragraphs:
+        tokens = count_tokens(paragraph)
+        if tokens > max_tokens:
+            words = paragraph.split()
+            step = max(1, len(words) * max_tokens // tokens)
+            pieces = [" ".join(words[i:i + step]) for i in range(0, len(words), step)]
+        else:
+            pieces = [paragraph]
+        for piece in pieces:
+            piece_tokens = count_tokens(piece)
+            if current and current_tokens + piece_tokens > max_tokens:
+                chunks.append("\n".join(current))
+                current, current_tokens = [], 0
+            current.append(piece)
+            current_tokens += piece_tokens
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
+
+
+# Текст статьи после очистки: один фрагмент или несколько частей для map-reduce
+class PreparedText:
+    def __init__(self, chunks, tokens_before, tokens_after, truncated):
+        self.chunks = chunks
+        self.tokens_before = tokens_before
+        self.tokens_after = tokens_after
+        self.truncated = truncated
+
+    @property
+    def text(self):
+        return "\n".join(self.chunks)
+
+    @property
+    def needs_map_reduce(self):
+        return len(self.chunks) > 1
+
+
+# Бюджет входного текста для LLM
+class TextBudget:
+    def __init__(self, max_input_tokens=6000, chunk_tokens=3000, max_chunks=8):
+        self.max_input_tokens = max_input_tokens
+        self.chunk_tokens = chunk_tokens
+        self.max_chunks = max_chunks
+
+    def prepare(self, full_text):
+        tokens_before = count_tokens(full_text)
+        paragraphs = dedupe_paragraphs(full_text.split("\n"))
+        text = "\n".join(paragraphs)
+        tokens_after = count_tokens(text)
+        if tokens_after <= self.max_input_tokens:
+            return PreparedText([text], tokens_before, tokens_after, truncated=False)
+
+        # Длинная статья: части для параллельной выжимки, лишние части отбрасываются
+        chunks = split_chunks(paragraphs, self.chunk_tokens)
+        truncated = len(chunks) > self.max_chunks
+        chunks = chunks[:self.max_chunks]
+        tokens_after = sum(count_tokens(chunk) for chunk in chunks)
+        return PreparedText(chunks, tokens_before, tokens_after, truncated)
@@ -0,0 +1,276 @@
+import logging
+import os
+import random
+import threading
+from datetime import datetime
+
+# Тяжёлые зависимости (cloudscraper, openai, HTML-парсеры) импортируются при первом обращении
+# к соответствующему объекту контекста, поэтому импорт модулей не требует сети и ключей
+
+
+# Атрибут контекста, создаваемый при первом обращении. Значение можно подменить присваиванием
+# (например, заглушкой в бенчмарке) до или после создания
+class lazy:
+    def __init__(self, factory):
+        self.factory = factory
+        self.name = factory.__name__
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        return instance.get(self.name, lambda: self.factory(instance))
+
+
+# Настройки из переменных окружения; читаются при создании, после load_dotenv()
+class Settings:
+    def __init__(self, env=None):
+        env = os.environ if env is None else env
+        self.openai_api_key = env.get("OPENAI_API_KEY")
+
+        # Хранилище статей (SQLite) и файлы прежнего формата для однократной миграции
+        self.db_file = env.get("NEWS_DB", "news.db")
+        self.csv_file = env.get("LEGACY_CSV_FILE", "news.csv")
+        self.sent_news_file = env.get("LEGACY_SENT_FILE", "sent_news.txt")
+
+        # Цены модели в долларах за миллион токенов, для оценки стоимости статьи в метриках
+        self.gpt_price_input = float(env.get("GPT_PRICE_INPUT", "2.5"))
+        self.gpt_price_output = float(env.get("GPT_PRICE_OUTPUT", "10"))
+
+        # Режим выжимки: "chain" - выжимка и перевод двумя запросами, "structured" - один запрос с JSON-схемой
+        self.summary_mode = env.get("SUMMARY_MODE", "chain")
+        self.structured_include_en = env.get("STRUCTURED_INCLUDE_EN", "0") == "1"  # Запрашивать и английскую выжимку
+        self.structured_max_attempts = int(env.get("STRUCTURED_MAX_ATTEMPTS", "3"))
+
+        # Кэш ответов LLM
+        self.llm_cache_db = env.get("LLM_CACHE_DB", "llm_cache.db")
+        self.llm_cache_max_entries = int(env.get("LLM_CACHE_MAX_ENTRIES", "5000"))
+        self.llm_cache_max_bytes = int(env.get("LLM_CACHE_MAX_BYTES", str(50 * 1024 * 1024)))
+        self.llm_cache_max_age_days = int(env.get("LLM_CACHE_MAX_AGE_DAYS", "30"))
+
+        # Бюджет входного текста для LLM: очистка от служебных абзацев, длинные статьи сокращаются по частям
+        self.llm_max_input_tokens = int(env.get("LLM_MAX_INPUT_TOKENS", "6000"))
+        self.llm_chunk_tokens = int(env.get("LLM_CHUNK_TOKENS", "3000"))
+        self.llm_max_chunks = int(env.get("LLM_MAX_CHUNKS", "8"))
+        self.chunk_workers = int(env.get("LLM_CHUNK_WORKERS", "4"))
+
+        # Пакетный режим: при стольких новых статьях за цикл они уходят в Batch API (0 - только по --backlog)
+        self.backlog_threshold = int(env.get("BACKLOG_THRESHOLD", "0"))
+        self.batch_poll_interval = int(env.get("BATCH_POLL_INTERVAL", "60"))
+
+        # Параметры конкурентной обработки статей
+        self.max_workers = int(env.get("PARSER_MAX_WORKERS", "4"))  # Статей на стадии выжимки одновременно
+        self.extract_workers = int(env.get("PARSER_EXTRACT_WORKERS", "4"))  # Статей на стадии загрузки текста
+        self.source_workers = int(env.get("PARSER_SOURCE_WORKERS", "4"))  # Источников опрашивается одновременно
+        self.per_host_concurrency = int(env.get("PARSER_PER_HOST_CONCURRENCY", "2"))  # Соединений к одному сайту
+        self.requests_per_second = float(env.get("PARSER_REQUESTS_PER_SECOND", "0.5"))  # Темп запросов к одному сайту
+        self.requests_burst = int(env.get("PARSER_REQUESTS_BURST", "2"))
+
+        # HTTP-клиент: пул соединений, повторы, предохранители по сайтам и предел размера ответа
+        self.http_timeout = float(env.get("HTTP_TIMEOUT", "10"))
+        self.http_pool_connections = int(env.get("HTTP_POOL_CONNECTIONS", "20"))  # Сайтов с открытым пулом
+        self.http_pool_maxsize = int(env.get("HTTP_POOL_MAXSIZE", "10"))  # Соединений в пуле одного сайта
+        self.http_max_attempts = int(env.get("HTTP_MAX_ATTEMPTS", "3"))
+        self.http_backoff_base = float(env.get("HTTP_BACKOFF_BASE", "1"))
+        self.http_backoff_max = float(env.get("HTTP_BACKOFF_MAX", "30"))
+        self.http_max_bytes = int(env.get("HTTP_MAX_BYTES", str(5 * 1024 * 1024)))
+        self.http_breaker_threshold = int(env.get("HTTP_BREAKER_THRESHOLD", "5"))
+        self.http_breaker_reset = float(env.get("HTTP_BREAKER_RESET", "300"))
+
+        # Каталог для HTML страниц, из которых не удалось извлечь текст, и число хранимых файлов
+        self.error_pages_dir = env.get("ERROR_PAGES_DIR", "error_pages")
+        self.error_pages_keep = int(env.get("ERROR_PAGES_KEEP", "20"))
+
+        # HTML-парсер (auto, selectolax, lxml или bs4), источники и порог почти-дубликатов (0 отключает)
+        self.html_parser = env.get("HTML_PARSER", "auto")
+        self.sources_file = env.get("SOURCES_FILE", "sources.json")
+        self.neardup_threshold = float(env.get("NEARDUP_THRESHOLD", "0.7"))
+
+        # Адаптивный опрос источников по истории публикаций (POLL_ADAPTIVE=0 - фиксированный poll_interval)
+        self.poll_adaptive = env.get("POLL_ADAPTIVE", "1") == "1"
+        self.poll_min_interval = float(env.get("POLL_MIN_INTERVAL", "300"))
+        self.poll_max_interval = float(env.get("POLL_MAX_INTERVAL", "3600"))
+        self.poll_lookback_days = int(env.get("POLL_LOOKBACK_DAYS", "14"))
+        self.poll_target_articles = float(env.get("POLL_TARGET_ARTICLES", "0.5"))  # Новых статей на один опрос
+
+
+USER_AGENTS = [
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 " \
+    "(KHTML, like Gecko) Chrome/112.0.0.0 Safari/537.36",
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 " \
+    "(KHTML, like Gecko) Version/14.0.3 Safari/605.1.15",
+    # Добавьте больше User-Agent по необходимости
+]
+
+
+# Общие объекты приложения: создаются при первом обращении и живут до конца процесса
+class AppContext:
+    def __init__(self, settings=None):
+        self.lock = threading.RLock()
+        if settings is not None:
+            self.settings = settings
+
+    def get(self, name, factory):
+        try:
+            return self.__dict__[name]
+        except KeyError:
+            pass
+        with self.lock:
+            if name not in self.__dict__:
+                self.__dict__[name] = factory()
+            return self.__dict__[name]
+
+    # Текущая дата в формате YYYY-MM-DD (долго работающий бот переходит через полночь)
+    @staticmethod
+    def today():
+        return datetime.now().strftime('%Y-%m-%d')
+
+    @lazy
+    def settings(self):
+        return Settings()
+
+    @lazy
+    def store(self):
+        from storage import ArticleStore
+
+        store = ArticleStore(self.settings.db_file)
+        store.migrate_legacy(self.settings.csv_file, self.settings.sent_news_file)
+        return store
+
+    @lazy
+    def llm_cache(self):
+        from llm_cache import LLMCache
+
+        return LLMCache(
+            self.settings.llm_cache_db,
+            max_entries=self.settings.llm_cache_max_entries,
+            max_bytes=self.settings.llm_cache_max_bytes,
+            max_age_days=self.settings.llm_cache_max_age_days,
+        )
+
+    @lazy
+    def text_budget(self):
+        from budget import TextBudget
+
+        return TextBudget(
+            max_input_tokens=self.settings.llm_max_input_tokens,
+            chunk_tokens=self.settings.llm_chunk_tokens,
+            max_chunks=self.settings.llm_max_chunks,
+        )
+
+    # Вежливый доступ к сайтам вместо фиксированной паузы после каждой статьи
+    @lazy
+    def host_limiter(self):
+        from ratelimit import HostLimiter
+
+        return HostLimiter(self.settings.per_host_concurrency, self.settings.requests_per_second,
+                           self.settings.requests_burst)
+
+    # HTTP-сессия cloudscraper с пулом соединений по настройкам
+    @lazy
+    def scraper(self):
+        import cloudscraper
+        from fetcher import configure_pool
+
+        scraper = cloudscraper.create_scraper()
+        configure_pool(scraper, self.settings.http_pool_connections, self.settings.http_pool_maxsize)
+        scraper.headers.update({
+            "User-Agent": random.choice(USER_AGENTS),
+            "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+            "Accept-Language": "en-US,en;q=0.5",
+            "Accept-Encoding": "gzip, deflate",
+            "Connection": "keep-alive",
+            "Upgrade-Insecure-Requests": "1",
+        })
+        return scraper
+
+    # Повторы с задержкой, предохранители по сайтам и предел размера ответа поверх сессии
+    @lazy
+    def http_client(self):
+        from fetcher import HttpClient
+
+        return HttpClient(
+            self.scraper,
+            self.host_limiter,
+            timeout=self.settings.http_timeout,
+            max_attempts=self.settings.http_max_attempts,
+            backoff_base=self.settings.http_backoff_base,
+            backoff_max=self.settings.http_backoff_max,
+            max_bytes=self.settings.http_max_bytes,
+            failure_threshold=self.settings.http_breaker_threshold,
+            reset_timeout=self.settings.http_breaker_reset,
+        )
+
+    # Загрузка страниц с условными запросами: ETag/Last-Modified и хеш содержимого хранятся в базе
+    @lazy
+    def fetcher(self):
+        from fetcher import ConditionalFetcher
+
+        return ConditionalFetcher(self.http_client, self.store)
+
+    @lazy
+    def error_capture(self):
+        from fetcher import ErrorCapture
+
+        return ErrorCapture(self.settings.error_pages_dir, self.settings.error_pages_keep)
+
+    @lazy
+    def extractor(self):
+        from extractors import get_extractor
+
+        return get_extractor(self.settings.html_parser)
+
+    # Поиск почти-дубликатов (перепечатки, правки) до обращения к GPT-4; None, если отключён
+    @lazy
+    def neardup_index(self):
+        if self.settings.neardup_threshold <= 0:
+            return None
+        from neardup import NearDuplicateIndex
+
+        return NearDuplicateIndex(self.settings.db_file, threshold=self.settings.neardup_threshold)
+
+    # Источники новостей (SOURCES_FILE - JSON со списком источников, см. sources.load_sources)
+    @lazy
+    def source_registry(self):
+        from sources import SourceRegistry, load_sources
+
+        interval = self.poll_schedule.interval if self.poll_schedule else None
+        return SourceRegistry(load_sources(self.settings.sources_file), interval=interval)
+
+    # Интервалы опроса по истории публикаций; None, если адаптивный опрос отключён
+    @lazy
+    def poll_schedule(self):
+        if not self.settings.poll_adaptive:
+            return None
+        from scheduler import AdaptiveSchedule
+
+        return AdaptiveSchedule(
+            self.store,
+            min_interval=self.settings.poll_min_interval,
+            max_interval=self.settings.poll_max_interval,
+            lookback_days=self.settings.poll_lookback_days,
+            target_articles=self.settings.poll_target_articles,
+        )
+
+    # Клиент OpenAI; без ключа ошибка возникает при первом запросе, а не при импорте
+    @lazy
+    def openai(self):
+        import openai
+
+        if not self.settings.openai_api_key:
+            raise RuntimeError("OPENAI_API_KEY не установлена в переменных окружения.")
+        return openai.OpenAI(api_key=self.settings.openai_api_key)
+
+
+# Настройка логирования для точки входа (файл журнала и консоль)
+def setup_logging(filename, level=None):
+    logging.basicConfig(
+        level=level or os.getenv("LOG_LEVEL", "INFO"),
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler(filename, encoding='utf-8'),
+            logging.StreamHandler()
+        ]
+    )
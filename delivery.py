@@ -0,0 +1,103 @@
+import json
+import logging
+import random
+import threading
+import time
+
+import metrics
+from ratelimit import TokenBucket
+
+
+# Telegram попросил подождать (ответ 429 с retry_after)
+class RetryAfter(Exception):
+    def __init__(self, seconds):
+        super().__init__(f"retry after {seconds} s")
+        self.seconds = seconds
+
+
+# Telegram отклонил сообщение (ответ 4xx, кроме 429): повтор не поможет
+class PermanentError(Exception):
+    pass
+
+
+# Отправка сообщений из постоянной очереди с учётом лимитов Telegram:
+# общий лимит бота и отдельный лимит на каждый чат, по потоку на чат.
+# Временные ошибки (сеть, 5xx) повторяются без ограничения числа попыток с задержкой не больше
+# backoff_max, поэтому сообщения переживают долгий сбой Telegram или сети; окончательно
+# не отправляется только сообщение, отклонённое Telegram (PermanentError)
+class DeliveryWorker:
+    def __init__(self, store, send, chat_ids, global_rate=30, chat_rate=20 / 60, chat_burst=3,
+                 backoff_base=5, backoff_max=600, poll_interval=1):
+        self.store = store
+        self.send = send  # send(chat_id, payload); при 429 бросает RetryAfter, при 4xx - PermanentError
+        self.chat_ids = [str(chat_id) for chat_id in chat_ids]
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.chat_buckets = {chat_id: TokenBucket(chat_rate, chat_burst) for chat_id in self.chat_ids}
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.poll_interval = poll_interval
+        self.wake = threading.Event()
+        self.stopped = threading.Event()
+        self.threads = []
+
+    # Ставит сообщение в очередь для всех чатов
+    def enqueue(self, data_key, payload):
+        self.store.enqueue_delivery(data_key, self.chat_ids, json.dumps(payload, ensure_ascii=False))
+        self.wake.set()
+
+    def start(self):
+        for chat_id in self.chat_ids:
+            thread = threading.Thread(target=self._run, args=(chat_id,), name=f"delivery-{chat_id}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+        logging.info(f"Очередь доставки запущена для чатов: {', '.join(self.chat_ids)}.")
+
+    def stop(self):
+        self.stopped.set()
+        self.wake.set()
+        for thread in self.threads:
+            thread.join()
+
+    def _run(self, chat_id):
+        while not self.stopped.is_set():
+            try:
+                delivery = self.store.next_delivery(chat_id, time.time())
+            except Exception as e:
+                logging.error(f"Ошибка чтения очереди доставки для чата {chat_id}: {e}")
+                delivery = None
+            if not delivery:
+                self.wake.wait(self.poll_interval)
+                self.wake.clear()
+                continue
+            self._deliver(chat_id, delivery)
+
+    def _deliver(self, chat_id, delivery):
+        payload = json.loads(delivery['payload'])
+        title = payload.get('title', delivery['data_key'])
+        self.chat_buckets[chat_id].acquire()
+        self.global_bucket.acquire()
+        attempts = delivery['attempts'] + 1
+        try:
+            with metrics.span("telegram_send_seconds"):
+                self.send(chat_id, payload)
+        except RetryAfter as e:
+            metrics.inc("telegram_messages_total", result="retry_after")
+            # Ожидание по требованию Telegram не считается неудачной попыткой
+            logging.warning(f"❌ API ошибка 429 для чата {chat_id}: повтор через {e.seconds} секунд.")
+            self.store.reschedule_delivery(delivery['id'], time.time() + e.seconds, str(e), delivery['attempts'])
+            self.stopped.wait(e.seconds)
+            return
+        except PermanentError as e:
+            metrics.inc("telegram_messages_total", result="failed")
+            logging.error(f"❌ Новость '{title}' отклонена Telegram для чата {chat_id}: {e}")
+            self.store.fail_delivery(delivery['id'], str(e), attempts)
+            return
+        except Exception as e:
+            metrics.inc("telegram_messages_total", result="error")
+            delay = min(self.backoff_max, self.backoff_base * 2 ** (attempts - 1)) * random.uniform(0.8, 1.2)
+            logging.error(f"❌ Ошибка при отправке новости '{title}' в чат {chat_id}: {e}. Повтор через {delay:.0f} с.")
+            self.store.reschedule_delivery(delivery['id'], time.time() + delay, str(e), attempts)
+            return
+        self.store.complete_delivery(delivery['id'])
+        metrics.inc("telegram_messages_total", result="sent")
+        logging.info(f"✅ Новость отправлена в чат {chat_id}: {title}")
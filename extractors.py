@@ -0,0 +1,204 @@
+import logging
+import os
+from urllib.parse import urlparse
+
+import metrics
+
+# Селекторы текста статьи для известных сайтов (по порядку приоритета)
+SITE_SELECTORS = {
+    "climaterealism.com": ["div.td-post-content p", "article p"],
+}
+DEFAULT_SELECTORS = ["article p", "main p"]
+
+# Контейнеры, текст которых не относится к статье
+BOILERPLATE_TAGS = {"nav", "footer", "aside", "header", "form"}
+
+
+# Общая логика извлечения поверх конкретного HTML-парсера
+class Extractor:
+    name = None
+
+    def parse(self, html):
+        raise NotImplementedError
+
+    def select(self, doc, selector):
+        raise NotImplementedError
+
+    def text(self, node):
+        raise NotImplementedError
+
+    def attr(self, node, name):
+        raise NotImplementedError
+
+    def parent(self, node):
+        raise NotImplementedError
+
+    def tag(self, node):
+        raise NotImplementedError
+
+    def node_id(self, node):
+        return id(node)
+
+    # Заголовки и ссылки статей на странице со списком
+    def listing(self, html, selector):
+        with metrics.span("html_parse_seconds", parser=self.name, kind="listing"):
+            items = []
+            for link in self.select(self.parse(html), selector):
+                href = self.attr(link, 'href')
+                if href:
+                    items.append((self.text(link) or "Без заголовка", href))
+            return items
+
+    # Абзацы текста статьи: сначала селекторы источника и сайта, затем поиск основного блока текста
+    def article(self, html, url, selectors=None):
+        with metrics.span("html_parse_seconds", parser=self.name, kind="article"):
+            return self._article(html, url, selectors)
+
+    def _article(self, html, url, selectors):
+        doc = self.parse(html)
+        host = urlparse(url).netloc.lower().removeprefix("www.")
+        for selector in list(selectors or []) + SITE_SELECTORS.get(host, []) + DEFAULT_SELECTORS:
+            paragraphs = [text for text in (self.text(p) for p in self.select(doc, selector)) if text]
+            if paragraphs:
+                return paragraphs
+        logging.debug(f"Селекторы не подошли для {url}, используется поиск основного блока текста.")
+        return self.readability(doc)
+
+    # Упрощённый аналог readability: блок с наибольшим объёмом текста в непосредственных <p>
+    def readability(self, doc):
+        groups = {}
+        for p in self.select(doc, "p"):
+            text = self.text(p)
+            parent = self.parent(p)
+            if not text or parent is None or self._in_boilerplate(p):
+                continue
+            key = self.node_id(parent)
+            score, paragraphs = groups.get(key, (0, []))
+            paragraphs.append(text)
+            groups[key] = (score + len(text), paragraphs)
+        if not groups:
+            return []
+        return max(groups.values(), key=lambda group: group[0])[1]
+
+    def _in_boilerplate(self, node):
+        node = self.parent(node)
+        while node is not None:
+            if self.tag(node) in BOILERPLATE_TAGS:
+                return True
+            node = self.parent(node)
+        return False
+
+
+# Парсер на BeautifulSoup (прежний путь, без дополнительных зависимостей)
+class BeautifulSoupExtractor(Extractor):
+    name = "bs4"
+
+    def __init__(self, features="html.parser"):
+        from bs4 import BeautifulSoup
+        self.soup_class = BeautifulSoup
+        self.features = features
+
+    def parse(self, html):
+        return self.soup_class(html, self.features)
+
+    def select(self, doc, selector):
+        return doc.select(selector)
+
+    def text(self, node):
+        return " ".join(node.get_text(" ").split())
+
+    def attr(self, node, name):
+        return node.get(name)
+
+    def parent(self, node):
+        parent = node.parent
+        return parent if parent is not None and parent.name != "[document]" else None
+
+    def tag(self, node):
+        return node.name
+
+
+# Парсер на lxml (CSS-селекторы через cssselect)
+class LxmlExtractor(Extractor):
+    name = "lxml"
+
+    def __init__(self):
+        import lxml.html
+        from lxml.cssselect import CSSSelector
+        self.html = lxml.html
+        self.selector_class = CSSSelector
+        self.selectors = {}
+
+    def parse(self, html):
+        return self.html.fromstring(html)
+
+    def select(self, doc, selector):
+        if selector not in self.selectors:
+            self.selectors[selector] = self.selector_class(selector)
+        return self.selectors[selector](doc)
+
+    def text(self, node):
+        return " ".join(node.text_content().split())
+
+    def attr(self, node, name):
+        return node.get(name)
+
+    def parent(self, node):
+        return node.getparent()
+
+    def tag(self, node):
+        return node.tag
+
+    # Прокси-объекты lxml пересоздаются, но для одного узла равны, пока на него есть ссылка
+    def node_id(self, node):
+        return node
+
+
+# Парсер на selectolax/lexbor (самый быстрый, необязательная зависимость)
+class SelectolaxExtractor(Extractor):
+    name = "selectolax"
+
+    def __init__(self):
+        from selectolax.lexbor import LexborHTMLParser
+        self.parser_class = LexborHTMLParser
+
+    def parse(self, html):
+        return self.parser_class(html)
+
+    def select(self, doc, selector):
+        return doc.css(selector)
+
+    def text(self, node):
+        return " ".join(node.text(separator=" ").split())
+
+    def attr(self, node, name):
+        return node.attributes.get(name)
+
+    def parent(self, node):
+        return node.parent
+
+    def tag(self, node):
+        return node.tag
+
+    def node_id(self, node):
+        return node.mem_id
+
+
+EXTRACTORS = {
+    "selectolax": SelectolaxExtractor,
+    "lxml": LxmlExtractor,
+    "bs4": BeautifulSoupExtractor,
+}
+
+
+# Выбор парсера: указанный явно или самый быстрый из установленных
+def get_extractor(name=None):
+    name = name or os.getenv("HTML_PARSER", "auto")
+    if name != "auto":
+        return EXTRACTORS[name]()
+    for candidate in EXTRACTORS.values():
+        try:
+            return candidate()
+        except ImportError:
+            continue
+    raise ImportError("Не установлен ни один HTML-парсер (selectolax, lxml или beautifulsoup4).")
@@ -0,0 +1,284 @@
+import hashlib
+import logging
+import os
+import queue
+import random
+import threading
+import time
+import zlib
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+import metrics
+
+# Ответы, после которых запрос имеет смысл повторить (перегрузка, сбой шлюза, проверка Cloudflare)
+RETRY_STATUSES = {429, 500, 502, 503, 504, 520, 521, 522, 523, 524}
+
+
+# Сайт временно недоступен: после серии неудач запросы к нему не отправляются
+class CircuitOpenError(Exception):
+    pass
+
+
+# Ответ больше допустимого размера
+class ResponseTooLarge(Exception):
+    pass
+
+
+# Предохранитель для одного сайта: после failure_threshold неудач подряд запросы не идут
+# reset_timeout секунд, затем пропускается один пробный запрос
+class CircuitBreaker:
+    def __init__(self, failure_threshold=5, reset_timeout=300):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+        self.lock = threading.Lock()
+
+    def allow(self):
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            if not self.probing and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.probing = True
+                return True
+            return False
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.probing = False
+
+    # True, если предохранитель только что сработал
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.probing or (self.opened_at is None and self.failures >= self.failure_threshold):
+                self.opened_at = time.monotonic()
+                self.probing = False
+                return True
+            return False
+
+
+# Ответ, прочитанный клиентом целиком (тело распаковано)
+class HttpResponse:
+    def __init__(self, url, status_code, content, headers):
+        self.url = url
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers
+
+
+# Размер пула соединений для адаптеров сессии (в том числе адаптера cloudscraper с его настройками TLS)
+def configure_pool(session, connections, maxsize):
+    for adapter in session.adapters.values():
+        if hasattr(adapter, 'init_poolmanager'):
+            adapter._pool_connections = connections
+            adapter._pool_maxsize = maxsize
+            adapter.init_poolmanager(connections, maxsize, block=adapter._pool_block)
+
+
+# HTTP-клиент поверх сессии: ограничение темпа по сайтам, повторы с экспоненциальной задержкой
+# и случайным разбросом, предохранители по сайтам и предел размера ответа
+class HttpClient:
+    def __init__(self, session, limiter, timeout=10, max_attempts=3, backoff_base=1.0, backoff_max=30,
+                 max_bytes=5 * 1024 * 1024, failure_threshold=5, reset_timeout=300):
+        self.session = session
+        self.limiter = limiter
+        self.timeout = timeout
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_bytes = max_bytes
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.breakers = {}
+        self.lock = threading.Lock()
+
+    def breaker(self, host):
+        with self.lock:
+            if host not in self.breakers:
+                self.breakers[host] = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+            return self.breakers[host]
+
+    def get(self, url, headers=None):
+        host = urlparse(url).netloc
+        breaker = self.breaker(host)
+        if not breaker.allow():
+            raise CircuitOpenError(f"сайт {host} временно отключён после серии ошибок")
+
+        for attempt in range(1, self.max_attempts + 1):
+            error = response = None
+            try:
+                with self.limiter.limit(url):
+                    with metrics.span("http_request_seconds", host=host):
+                        response = self._request(url, headers)
+                metrics.inc("http_responses_total", host=host, status=response.status_code)
+            except ResponseTooLarge:
+                breaker.record_success()
+                raise
+            except Exception as e:
+                error = e
+
+            if response is not None and response.status_code not in RETRY_STATUSES:
+                breaker.record_success()
+                return response
+            if attempt == self.max_attempts:
+                break
+
+            delay = min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1)) * random.uniform(0.5, 1.5)
+            if response is not None:
+                delay = max(delay, min(self.backoff_max, retry_after(response.headers)))
+            reason = error if error is not None else f"ответ {response.status_code}"
+            logging.warning(f"Запрос {url} не удался ({reason}), попытка {attempt} из {self.max_attempts}, "
+                            f"повтор через {delay:.1f} с.")
+            metrics.inc("http_retries_total", host=host)
+            time.sleep(delay)
+
+        if breaker.record_failure():
+            logging.error(f"Сайт {host} отключён на {self.reset_timeout} с после {breaker.failures} неудач подряд.")
+            metrics.inc("http_circuit_open_total", host=host)
+        if error is not None:
+            raise error
+        return response
+
+    # Тело читается потоком с распаковкой gzip/deflate; чтение прерывается, если ответ больше max_bytes
+    def _request(self, url, headers):
+        response = self.session.get(url, headers=headers, timeout=self.timeout, stream=True)
+        try:
+            length = response.headers.get('Content-Length')
+            if length and length.isdigit() and int(length) > self.max_bytes:
+                raise ResponseTooLarge(f"ответ {url} размером {length} байт больше {self.max_bytes}")
+            chunks = []
+            size = 0
+            for chunk in response.iter_content(chunk_size=64 * 1024):
+                size += len(chunk)
+                if size > self.max_bytes:
+                    raise ResponseTooLarge(f"ответ {url} больше {self.max_bytes} байт")
+                chunks.append(chunk)
+            return HttpResponse(url, response.status_code, b"".join(chunks), response.headers)
+        finally:
+            response.close()
+
+
+# Задержка из заголовка Retry-After (секунды или дата), 0 если заголовка нет
+def retry_after(headers):
+    value = (headers or {}).get('Retry-After')
+    if not value:
+        return 0
+    if value.isdigit():
+        return int(value)
+    try:
+        return max(0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return 0
+
+
+# Сохранение HTML страниц, из которых не удалось извлечь текст: запись в фоновом потоке,
+# хранится не больше max_files последних файлов, при переполнении очереди страницы пропускаются
+class ErrorCapture:
+    def __init__(self, directory="error_pages", max_files=20, queue_size=50):
+        self.directory = directory
+        self.max_files = max_files
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.thread = None
+        self.lock = threading.Lock()
+
+    def capture(self, url, content):
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name="error-capture", daemon=True)
+                self.thread.start()
+        try:
+            self.queue.put_nowait((url, content))
+        except queue.Full:
+            return None
+        return self.path(url)
+
+    def path(self, url):
+        name = hashlib.sha256(url.encode('utf-8')).hexdigest()[:16]
+        return os.path.join(self.directory, f"{urlparse(url).netloc or 'page'}-{name}.html")
+
+    def _run(self):
+        while True:
+            url, content = self.queue.get()
+            try:
+                self._write(url, content)
+            except Exception as e:
+                logging.error(f"Не удалось сохранить HTML страницы {url}: {e}")
+            finally:
+                self.queue.task_done()
+
+    def _write(self, url, content):
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self.path(url), 'wb') as file:
+            file.write(content)
+        files = sorted(
+            (os.path.join(self.directory, name) for name in os.listdir(self.directory) if name.endswith('.html')),
+            key=os.path.getmtime,
+        )
+        for old in files[:-self.max_files]:
+            os.remove(old)
+
+
+# Результат загрузки страницы; для ответа 304 содержит тело из кэша
+class FetchResult:
+    def __init__(self, url, status_code, content=b"", headers=None, not_modified=False, previous_hash=None):
+        self.url = url
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+        self.not_modified = not_modified
+        self.previous_hash = previous_hash
+        self.content_hash = hashlib.sha256(content).hexdigest()
+
+    @property
+    def text(self):
+        return self.content.decode('utf-8', errors='replace')
+
+    # Содержимое отличается от сохранённого ранее
+    @property
+    def changed(self):
+        return not self.not_modified and self.content_hash != self.previous_hash
+
+
+# Загрузка страниц с условными запросами (If-None-Match / If-Modified-Since) через HttpClient
+class ConditionalFetcher:
+    def __init__(self, client, store):
+        self.client = client
+        self.store = store
+
+    def get(self, url):
+        cached = self.store.get_http_cache(url)
+        headers = {}
+        if cached and cached['body'] is not None:
+            if cached['etag']:
+                headers['If-None-Match'] = cached['etag']
+            if cached['last_modified']:
+                headers['If-Modified-Since'] = cached['last_modified']
+
+        response = self.client.get(url, headers=headers)
+
+        previous_hash = cached['content_hash'] if cached else None
+        if response.status_code == 304 and headers:
+            logging.info(f"Страница {url} не изменилась (304).")
+            result = FetchResult(url, 200, zlib.decompress(cached['body']), response.headers,
+                                 not_modified=True, previous_hash=previous_hash)
+            result.content_hash = previous_hash
+            return result
+        return FetchResult(url, response.status_code, response.content, response.headers,
+                           previous_hash=previous_hash)
+
+    # Сохраняет валидаторы и тело ответа; вызывается после успешной обработки страницы
+    def remember(self, result):
+        if result.status_code != 200 or result.not_modified:
+            return
+        self.store.set_http_cache(
+            result.url,
+            result.headers.get('ETag'),
+            result.headers.get('Last-Modified'),
+            result.content_hash,
+            zlib.compress(result.content),
+        )
@@ -0,0 +1,113 @@
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+import unicodedata
+
+import metrics
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS llm_cache (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_llm_cache_created_at ON llm_cache(created_at);
+CREATE INDEX IF NOT EXISTS idx_llm_cache_accessed_at ON llm_cache(accessed_at);
+"""
+
+
+# Нормализация текста для ключа: одинаковая статья с разными пробелами даёт один ключ
+def normalize_text(text):
+    return " ".join(unicodedata.normalize('NFC', text or "").split())
+
+
+# Ключ кэша: модель, версия шаблона промпта, вид запроса и нормализованные тексты
+def make_key(model, prompt_version, kind, *texts):
+    digest = hashlib.sha256()
+    for part in (model, str(prompt_version), kind) + tuple(normalize_text(t) for t in texts):
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\x00')
+    return digest.hexdigest()
+
+
+# Дисковый кэш ответов LLM с вытеснением по возрасту и объёму
+class LLMCache:
+    def __init__(self, path, max_entries=5000, max_bytes=50 * 1024 * 1024, max_age_days=30):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_age_days = max_age_days
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.puts = 0
+        with self._conn() as conn:
+            conn.executescript(SCHEMA)
+        self.evict()
+
+    def _conn(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self.local.conn = conn
+        return conn
+
+    def get(self, key):
+        now = time.time()
+        with self._conn() as conn:
+            row = conn.execute(
+                "SELECT value FROM llm_cache WHERE key = ? AND created_at >= ?",
+                (key, now - self.max_age_days * 86400),
+            ).fetchone()
+            if row:
+                conn.execute("UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (now, key))
+        with self.lock:
+            if row:
+                self.hits += 1
+            else:
+                self.misses += 1
+        metrics.inc("llm_cache_requests_total", result="hit" if row else "miss")
+        return row[0] if row else None
+
+    def put(self, key, value):
+        now = time.time()
+        with self._conn() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, value, len(value.encode('utf-8')), now, now),
+            )
+        with self.lock:
+            self.puts += 1
+            evict_now = self.puts % 50 == 0
+        if evict_now:
+            self.evict()
+
+    # Удаляет устаревшие записи, затем самые давно использованные сверх лимитов
+    def evict(self):
+        with self._conn() as conn:
+            expired = conn.execute(
+                "DELETE FROM llm_cache WHERE created_at < ?", (time.time() - self.max_age_days * 86400,)
+            ).rowcount
+            overflow = conn.execute(
+                "DELETE FROM llm_cache WHERE key IN ("
+                " SELECT key FROM ("
+                "  SELECT key,"
+                "   SUM(size) OVER (ORDER BY accessed_at DESC) AS total,"
+                "   ROW_NUMBER() OVER (ORDER BY accessed_at DESC) AS n"
+                "  FROM llm_cache)"
+                " WHERE total > ? OR n > ?)",
+                (self.max_bytes, self.max_entries),
+            ).rowcount
+        if expired or overflow:
+            logging.info(f"Кэш LLM: удалено {expired} устаревших и {overflow} вытесненных записей.")
+
+    def stats(self):
+        with self.lock:
+            return {'hits': self.hits, 'misses': self.misses}
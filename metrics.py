@@ -0,0 +1,203 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Границы корзин гистограмм в секундах: от разбора HTML до долгих запросов к GPT-4
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+def _labels_key(labels):
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+                break
+
+
+# Счётчики и гистограммы с метками; потокобезопасны, отдаются в текстовом формате Prometheus
+class Metrics:
+    def __init__(self):
+        self.counters = {}
+        self.histograms = {}
+        self.descriptions = {}
+        self.lock = threading.Lock()
+        self.last_summary = {}
+
+    def describe(self, name, text):
+        self.descriptions[name] = text
+
+    def inc(self, name, value=1, **labels):
+        key = (name, _labels_key(labels))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = (name, _labels_key(labels))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(value)
+
+    # Замер длительности блока: гистограмма name, при исключении ещё и счётчик name_errors_total
+    @contextmanager
+    def span(self, name, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            self.inc(name.removesuffix("_seconds") + "_errors_total", **labels)
+            raise
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    # Текущие значения: счётчики и (число, сумма) гистограмм
+    def snapshot(self):
+        with self.lock:
+            values = dict(self.counters)
+            values.update({key: (h.count, h.sum) for key, h in self.histograms.items()})
+        return values
+
+    # Строки сводки с момента предыдущего вызова: число замеров, суммарное и среднее время, прирост счётчиков
+    def summary(self):
+        current = self.snapshot()
+        previous, self.last_summary = self.last_summary, current
+        lines = []
+        for key in sorted(current):
+            name, labels = key
+            value = current[key]
+            if isinstance(value, tuple):
+                count = value[0] - previous.get(key, (0, 0.0))[0]
+                total = value[1] - previous.get(key, (0, 0.0))[1]
+                if count:
+                    lines.append(f"{name}{_format_labels(labels)}: {count} шт., всего {total:.2f} с, "
+                                 f"в среднем {total / count * 1000:.0f} мс")
+            else:
+                delta = value - previous.get(key, 0)
+                if delta:
+                    lines.append(f"{name}{_format_labels(labels)}: {delta:g}")
+        return lines
+
+    def render(self):
+        with self.lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted((key, (list(h.counts), h.count, h.sum, h.buckets))
+                                for key, h in self.histograms.items())
+        lines = []
+        described = set()
+
+        def header(name, kind):
+            if name not in described:
+                described.add(name)
+                if name in self.descriptions:
+                    lines.append(f"# HELP {name} {self.descriptions[name]}")
+                lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), value in counters:
+            header(name, "counter")
+            lines.append(f"{name}{_format_labels(labels)} {value:g}")
+        for (name, labels), (counts, count, total, buckets) in histograms:
+            header(name, "histogram")
+            cumulative = 0
+            for bound, bucket_count in zip(buckets, counts):
+                cumulative += bucket_count
+                lines.append(f"{name}_bucket{_format_labels(labels, [('le', f'{bound:g}')])} {cumulative}")
+            lines.append(f"{name}_bucket{_format_labels(labels, [('le', '+Inf')])} {count}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {total:.6f}")
+            lines.append(f"{name}_count{_format_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+
+# Общий реестр процесса; модули пишут в него через функции ниже
+REGISTRY = Metrics()
+
+describe = REGISTRY.describe
+inc = REGISTRY.inc
+observe = REGISTRY.observe
+span = REGISTRY.span
+summary = REGISTRY.summary
+
+describe("http_request_seconds", "Duration of HTTP requests to news sites")
+describe("http_responses_total", "HTTP responses by host and status")
+describe("html_parse_seconds", "HTML parsing time by parser and page kind")
+describe("pipeline_stage_seconds", "Time spent per article in each pipeline stage")
+describe("llm_request_seconds", "Duration of OpenAI chat completion requests")
+describe("llm_tokens_total", "OpenAI tokens by request kind and token type")
+describe("llm_cost_usd_total", "Estimated OpenAI cost in USD")
+describe("llm_cache_requests_total", "LLM response cache lookups by result")
+describe("articles_stored_total", "Articles summarized and stored")
+describe("telegram_send_seconds", "Duration of Telegram send_message calls")
+describe("telegram_messages_total", "Telegram delivery attempts by result")
+
+
+# HTTP-сервер с метриками в формате Prometheus (GET /metrics) в отдельном потоке; hooks - обработчики
+# POST-запросов по пути (например, {"/poll": bot.trigger}), вызываются без аргументов
+class MetricsServer:
+    def __init__(self, port, host="127.0.0.1", registry=REGISTRY, hooks=None):
+        registry_ref = registry
+        hooks = dict(hooks or {})
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = registry_ref.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                hook = hooks.get(self.path.split("?")[0])
+                if hook is None:
+                    self.send_error(404)
+                    return
+                try:
+                    hook()
+                except Exception as e:
+                    logging.error(f"Ошибка обработчика {self.path}: {e}")
+                    self.send_error(500)
+                    return
+                self.send_response(202)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, name="metrics", daemon=True)
+        self.thread.start()
+        host, port = self.server.server_address[:2]
+        logging.info(f"Метрики доступны по адресу http://{host}:{port}/metrics")
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,162 @@
+import hashlib
+import random
+import re
+import sqlite3
+import threading
+import time
+from array import array
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS neardup_signatures (
+    data_key TEXT PRIMARY KEY,
+    signature BLOB NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_neardup_signatures_created_at ON neardup_signatures(created_at);
+CREATE TABLE IF NOT EXISTS neardup_bands (
+    band INTEGER NOT NULL,
+    bucket TEXT NOT NULL,
+    data_key TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_neardup_bands_bucket ON neardup_bands(band, bucket);
+CREATE INDEX IF NOT EXISTS idx_neardup_bands_data_key ON neardup_bands(data_key);
+"""
+
+# Хеш-функции вида (a * x + b) mod p над 32-битными хешами шинглов: все вычисления помещаются в uint64
+PRIME = 4294967291
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+# Шинглы текста: последовательности из k слов, приведённые к 32-битным хешам
+def shingles(text, k=4):
+    words = WORD_RE.findall(text.lower())
+    if len(words) < k:
+        return set()
+    return {
+        int.from_bytes(hashlib.blake2b(" ".join(words[i:i + k]).encode('utf-8'), digest_size=4).digest(), 'little')
+        for i in range(len(words) - k + 1)
+    }
+
+
+# Выбор числа полос LSH: порог срабатывания полос с запасом ниже заданного,
+# чтобы похожие статьи почти наверняка попали в кандидаты (окончательно решает оценка сходства)
+def choose_bands(num_perm, threshold):
+    best = (num_perm, 1)
+    for rows in range(1, num_perm + 1):
+        if num_perm % rows:
+            continue
+        bands = num_perm // rows
+        if (1 / bands) ** (1 / rows) <= threshold - 0.1:
+            best = (bands, rows)
+    return best
+
+
+# Индекс почти-дубликатов на MinHash-LSH, хранится в SQLite между запусками
+class NearDuplicateIndex:
+    def __init__(self, path, threshold=0.7, num_perm=128, shingle_size=4, min_shingles=20, seed=1):
+        self.path = path
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.min_shingles = min_shingles
+        self.bands, self.rows = choose_bands(num_perm, threshold)
+        rng = random.Random(seed)
+        self.permutations = [(rng.randrange(1, PRIME), rng.randrange(0, PRIME)) for _ in range(num_perm)]
+        if numpy is not None:
+            self.coefficients = numpy.array(self.permutations, dtype=numpy.uint64)
+        self.local = threading.local()
+        with self._conn() as conn:
+            conn.executescript(SCHEMA)
+
+    def _conn(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self.local.conn = conn
+        return conn
+
+    # MinHash-подпись текста; None, если текст слишком короткий для надёжной оценки.
+    # С numpy все хеш-функции считаются одной матричной операцией
+    def signature(self, text):
+        hashes = shingles(text, self.shingle_size)
+        if len(hashes) < self.min_shingles:
+            return None
+        if numpy is not None:
+            values = numpy.fromiter(hashes, dtype=numpy.uint64, count=len(hashes))
+            a = self.coefficients[:, 0:1]
+            b = self.coefficients[:, 1:2]
+            return ((a * values + b) % PRIME).min(axis=1).tolist()
+        return [min((a * h + b) % PRIME for h in hashes) for a, b in self.permutations]
+
+    def _buckets(self, signature):
+        for band in range(self.bands):
+            values = signature[band * self.rows:(band + 1) * self.rows]
+            yield band, hashlib.blake2b(array('Q', values).tobytes(), digest_size=8).hexdigest()
+
+    @staticmethod
+    def similarity(first, second):
+        return sum(1 for x, y in zip(first, second) if x == y) / len(first)
+
+    # Самая похожая статья из индекса: (data_key, сходство) или None. exclude - data_key самой статьи:
+    # её подпись могла остаться в индексе, если процесс остановился до сохранения статьи
+    def query(self, signature, exclude=None):
+        conn = self._conn()
+        candidates = set()
+        for band, bucket in self._buckets(signature):
+            rows = conn.execute(
+                "SELECT data_key FROM neardup_bands WHERE band = ? AND bucket = ?", (band, bucket)
+            ).fetchall()
+            candidates.update(row[0] for row in rows)
+        candidates.discard(exclude)
+        best = None
+        for data_key in candidates:
+            row = conn.execute("SELECT signature FROM neardup_signatures WHERE data_key = ?", (data_key,)).fetchone()
+            if not row:
+                continue
+            score = self.similarity(signature, array('Q', row[0]))
+            if score >= self.threshold and (best is None or score > best[1]):
+                best = (data_key, score)
+        return best
+
+    def add(self, data_key, signature):
+        with self._conn() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO neardup_signatures (data_key, signature, created_at) VALUES (?, ?, ?)",
+                (data_key, array('Q', signature).tobytes(), time.time()),
+            )
+            conn.execute("DELETE FROM neardup_bands WHERE data_key = ?", (data_key,))
+            conn.executemany(
+                "INSERT INTO neardup_bands (band, bucket, data_key) VALUES (?, ?, ?)",
+                [(band, bucket, data_key) for band, bucket in self._buckets(signature)],
+            )
+
+    def remove(self, data_key):
+        with self._conn() as conn:
+            conn.execute("DELETE FROM neardup_signatures WHERE data_key = ?", (data_key,))
+            conn.execute("DELETE FROM neardup_bands WHERE data_key = ?", (data_key,))
+
+    # Отмечает, что статьи всё ещё встречаются в списках источников (created_at - время последней встречи)
+    def touch(self, data_keys):
+        with self._conn() as conn:
+            conn.executemany(
+                "UPDATE neardup_signatures SET created_at = ? WHERE data_key = ?",
+                [(time.time(), data_key) for data_key in data_keys],
+            )
+
+    # Удаляет подписи статей, которые не встречались в списках источников max_age_days
+    def prune(self, max_age_days=30):
+        cutoff = time.time() - max_age_days * 86400
+        with self._conn() as conn:
+            conn.execute(
+                "DELETE FROM neardup_bands WHERE data_key IN "
+                "(SELECT data_key FROM neardup_signatures WHERE created_at < ?)", (cutoff,)
+            )
+            return conn.execute("DELETE FROM neardup_signatures WHERE created_at < ?", (cutoff,)).rowcount
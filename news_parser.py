@@ -0,0 +1,676 @@
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin, urlparse, urlunparse
+from dotenv import load_dotenv
+import argparse
+import hashlib
+import json
+import logging
+import threading
+import time
+from context import AppContext, setup_logging
+from llm_cache import make_key
+from batch import BatchProcessor, OpenAIBatchBackend
+from budget import count_tokens
+from pipeline import DONE, CycleTracker, Pipeline
+from sources import parse_feed
+import metrics
+
+# Параметры URL, которые добавляют счётчики и рассылки и не меняют статью: utm_* по префиксу,
+# остальные по точному имени (ref_id, reference и подобные относятся к самой статье)
+TRACKING_PREFIXES = ('utm_',)
+TRACKING_PARAMS = {'fbclid', 'gclid', 'yclid', 'mc_cid', 'mc_eid', '_ga', 'ref'}
+
+def is_tracking_param(name):
+    name = name.lower()
+    return name in TRACKING_PARAMS or name.startswith(TRACKING_PREFIXES)
+
+# Функция для нормализации URL
+def normalize_url(url):
+    parsed = urlparse(url)
+    normalized = parsed._replace(path=parsed.path.rstrip('/'))
+    if parsed.query:
+        params = [p for p in parsed.query.split('&') if not is_tracking_param(p.split('=', 1)[0])]
+        normalized = normalized._replace(query='&'.join(params))
+    return urlunparse(normalized)
+
+# Функция для генерации хеша из URL
+def generate_data_key(url):
+    normalized_url = normalize_url(url)
+    return hashlib.sha256(normalized_url.encode('utf-8')).hexdigest()
+
+# Модель и версия промптов для ключей кэша LLM; при изменении текста промптов увеличьте PROMPT_VERSION
+GPT_MODEL = "gpt-4o"
+PROMPT_VERSION = 1
+
+# Контекст приложения: хранилище, HTTP-сессия, клиент OpenAI и прочие объекты создаются
+# при первом обращении, настройки читаются из окружения там же (см. context.Settings)
+app = AppContext()
+
+# Функция очистки устаревших записей
+def clean_old_entries():
+    logging.info("Очистка старых записей из хранилища.")
+    try:
+        listings = [url for s in app.source_registry.sources for url in (s.listing_url, s.feed_url) if url]
+        articles = app.store.prune(app.today(), keep_urls=listings)  # Оставляем только сегодняшние записи
+        signatures = app.neardup_index.prune() if app.neardup_index else 0
+        logging.info(f"Очистка завершена: удалено {articles} статей и {signatures} подписей.")
+    except Exception as e:
+        logging.error(f"Ошибка при очистке старых записей: {e}")
+
+# Функция парсинга новостей: опрашивает источники, которые пора проверить (force - все сразу).
+# backlog=True отправляет новые статьи пакетным заданием. С переданным pipeline статьи ставятся
+# в работающий конвейер и функция не ждёт их обработки. Возвращает число опрошенных источников
+def fetch_news(backlog=None, pipeline=None, force=True):
+    # Сначала забираем готовые результаты ранее отправленных пакетных заданий
+    try:
+        batch_processor().poll()
+    except Exception as e:
+        logging.error(f"Ошибка при проверке пакетных заданий: {e}")
+
+    sources = app.source_registry.take_due(force=force)
+    if not sources:
+        return 0
+
+    # Статьи всех источников проходят общий конвейер: каждая публикуется сразу после готовности выжимки
+    own_pipeline = pipeline is None
+    if own_pipeline:
+        pipeline = create_pipeline()
+        pipeline.start()
+
+    with ThreadPoolExecutor(max_workers=app.settings.source_workers) as executor:
+        list(executor.map(lambda source: fetch_source(source, backlog, pipeline), sources))
+
+    if own_pipeline:
+        pipeline.join()
+        pipeline.stop()
+        cache_stats = app.llm_cache.stats()
+        logging.info(f"Все новости обработаны. Кэш LLM: попаданий {cache_stats['hits']}, промахов {cache_stats['misses']}.")
+    return len(sources)
+
+# Загрузка списка статей источника: RSS/Atom, при ошибке - HTML-страница
+def load_listing(source):
+    if source.feed_url:
+        logging.info(f"Запрос ленты {source.name}: {source.feed_url}")
+        try:
+            result = app.fetcher.get(source.feed_url)
+            if result.status_code == 200:
+                return result, [] if result.not_modified else parse_feed(result.content)
+            logging.error(f"Ошибка загрузки ленты {source.feed_url}: {result.status_code}")
+        except Exception as e:
+            logging.error(f"Ошибка разбора ленты {source.feed_url}: {e}")
+        if not source.listing_url:
+            return None, []
+
+    logging.info(f"Запрос к основному URL {source.name}: {source.listing_url}")
+    result = app.fetcher.get(source.listing_url)
+    if result.status_code != 200:
+        logging.error(f"Ошибка загрузки страницы {source.listing_url}: {result.status_code}")
+        return None, []
+    return result, [] if result.not_modified else app.extractor.listing(result.content, source.listing_selector)
+
+# Время опроса, в котором появились новые статьи источника, для истории публикаций (см. scheduler.py).
+# None для первого опроса и после долгого перерыва: тогда в списке накопились статьи за всё время
+# простоя, и их появление не говорит о том, когда источник обычно публикует
+def activity_time(source):
+    now = time.time()
+    previous = app.store.get_meta(f"last_poll:{source.name}")
+    app.store.set_meta(f"last_poll:{source.name}", str(now))
+    gap = 2 * max(app.settings.poll_max_interval, source.poll_interval)
+    return now if previous and now - float(previous) <= gap else None
+
+# Функция опроса одного источника
+def fetch_source(source, backlog, pipeline):
+    try:
+        listing, news_items = load_listing(source)
+        if listing is None:
+            return
+        seen_at = activity_time(source)
+        if listing.not_modified:
+            logging.info(f"Список статей {source.name} не изменился (304), цикл пропущен.")
+            return
+
+        logging.info(f"Найдено {len(news_items)} новостей в {source.name}.")
+        if not news_items:
+            logging.info("Нет новостей для обработки.")
+            return
+        # Относительные ссылки приводятся к полным адресам относительно страницы списка или ленты
+        news_items = [(title, urljoin(listing.url, post_url)) for title, post_url in news_items]
+
+        # Сравниваем список статей, а не весь HTML: динамические части страницы не влияют на результат
+        listing.content_hash = listing_fingerprint(news_items)
+        if not listing.changed:
+            logging.info(f"Список статей {source.name} не изменился, цикл пропущен.")
+            return
+
+        # Отбираем новые статьи, исключая повторы внутри страницы
+        pending = {}
+        known = []
+        waiting = 0
+        for title, post_url in news_items:
+            data_key = generate_data_key(post_url)  # Генерация хеша из нормализованного URL
+            logging.debug(f"Обрабатываем data_key: {data_key}")
+
+            if data_key in pending or app.store.is_known(data_key):
+                logging.info(f"Новость {post_url} уже добавлена.")
+                known.append(data_key)
+                continue
+            if app.store.in_batch(data_key):
+                logging.info(f"Новость {post_url} ожидает результата пакетного задания.")
+                waiting += 1
+                continue
+            pending[data_key] = {
+                'data_key': data_key,
+                'title': title,
+                'post_url': post_url,
+                'source': source.name,
+                'article_selectors': source.article_selectors,
+                'seen_at': seen_at,
+            }
+        # Подписи статей, которые ещё встречаются в списке, не удаляются при очистке
+        if known and app.neardup_index:
+            app.neardup_index.touch(known)
+
+        # Список запоминается, только когда все его статьи обработаны: статьи из пакетного задания,
+        # завершившегося ошибкой, и несохранённые статьи должны попасть в следующий цикл
+        def remember_listing():
+            if not waiting:
+                app.fetcher.remember(listing)
+
+        if not pending:
+            logging.info("Новых статей нет.")
+            remember_listing()
+            return
+        logging.info(f"Статей к обработке в {source.name}: {len(pending)}.")
+
+        if backlog is None:
+            backlog = app.settings.backlog_threshold > 0 and len(pending) >= app.settings.backlog_threshold
+        if backlog:
+            logging.info("Статьи будут обработаны пакетным заданием.")
+            submit_backlog(pending)
+            return
+
+        # Пока есть необработанные статьи, неизменённый список не должен пропускать цикл
+        def on_cycle_complete(failed):
+            if not failed:
+                remember_listing()
+            logging.info(f"Цикл обработки {source.name} завершён: статей {len(pending)}, не обработано {failed}.")
+            log_metrics_summary()
+
+        cycle = CycleTracker(len(pending), on_cycle_complete)
+        for data_key, item in pending.items():
+            item['cycle'] = cycle
+            if not pipeline.submit(data_key, item):
+                logging.info(f"Новость {item['post_url']} уже обрабатывается.")
+                cycle.done(False)
+        logging.info(f"Статьи {source.name} переданы в конвейер: {len(pending)}.")
+    except Exception as e:
+        logging.error(f"Ошибка при парсинге новостей {source.name}: {e}")
+
+# Сводка метрик с предыдущей сводки: где прошло время и сколько стоили статьи
+def log_metrics_summary():
+    previous = metrics.REGISTRY.last_summary
+    lines = metrics.summary()
+    current = metrics.REGISTRY.last_summary
+
+    def delta(name):
+        return sum(value - previous.get(key, 0) for key, value in current.items() if key[0] == name)
+
+    stored = delta("articles_stored_total")
+    if stored:
+        lines.append(f"средняя стоимость статьи: ${delta('llm_cost_usd_total') / stored:.4f}")
+    if lines:
+        logging.info("Метрики за цикл:\n  " + "\n  ".join(lines))
+
+def listing_fingerprint(news_items):
+    links = [post_url for _, post_url in news_items]
+    return hashlib.sha256("\n".join(links).encode('utf-8')).hexdigest()
+
+# Отпечаток содержимого статьи для поиска копий под другими URL
+def content_fingerprint(full_text):
+    return hashlib.sha256(" ".join(full_text.lower().split()).encode('utf-8')).hexdigest()
+
+# Отпечатки статей, которые сейчас в конвейере (копии из разных источников могут идти одновременно)
+fingerprints_in_flight = {}
+fingerprint_lock = threading.Lock()
+
+# Отсев копий по содержимому: отпечаток сверяется со статьями в обработке, сохранёнными и ждущими
+# пакетного задания, затем ищется почти-дубликат. Для новой статьи задаёт item['fingerprint'] и
+# регистрирует её в обработке; копия записывается в duplicates. Возвращает data_key оригинала или None
+def find_duplicate(item, full_text):
+    fingerprint = content_fingerprint(full_text)
+    signature = app.neardup_index.signature(full_text) if app.neardup_index else None
+    with fingerprint_lock:
+        duplicate_of = fingerprints_in_flight.get(fingerprint) or app.store.find_by_fingerprint(fingerprint)
+        if duplicate_of:
+            logging.info(f"Статья {item['post_url']} совпадает по содержимому с уже обработанной, пропуск.")
+        elif signature:
+            # Подпись добавляется сразу, чтобы копия в соседнем потоке нашла эту статью
+            match = app.neardup_index.query(signature, exclude=item['data_key'])
+            if match:
+                duplicate_of = match[0]
+                logging.info(f"Статья {item['post_url']} почти совпадает (сходство {match[1]:.2f}) с уже обработанной, пропуск.")
+            else:
+                app.neardup_index.add(item['data_key'], signature)
+                item['signature_added'] = True
+        if not duplicate_of:
+            fingerprints_in_flight[fingerprint] = item['data_key']
+    if duplicate_of:
+        app.store.add_duplicate(item['data_key'], duplicate_of)
+        return duplicate_of
+    item['fingerprint'] = fingerprint
+    return None
+
+# Снимает статью с обработки; подпись несохранённой статьи убирается из индекса
+def release_fingerprint(item, ok):
+    fingerprint = item.get('fingerprint')
+    if fingerprint:
+        with fingerprint_lock:
+            if fingerprints_in_flight.get(fingerprint) == item['data_key']:
+                del fingerprints_in_flight[fingerprint]
+            if not ok and item.get('signature_added'):
+                app.neardup_index.remove(item['data_key'])
+
+# Стадия конвейера: загрузка и извлечение полного текста статьи, отсев копий по содержимому
+def extract_stage(item):
+    full_text = fetch_full_text(item['post_url'], item.get('article_selectors'))
+    if not full_text:
+        logging.warning(f"Полный текст для статьи {item['post_url']} не был получен. Пропуск.")
+        return None
+    if find_duplicate(item, full_text):
+        return DONE
+
+    item['full_text'] = full_text
+    return item
+
+# Завершение обработки статьи в конвейере
+def on_article_done(item, ok):
+    release_fingerprint(item, ok)
+    if item.get('cycle'):
+        item['cycle'].done(ok)
+
+# Стадия конвейера: выжимка и перевод с GPT-4
+def summarize_stage(item):
+    full_text = prepare_for_llm(item['title'], item['full_text'], item['post_url'])
+    if not full_text:
+        logging.warning(f"Не удалось подготовить текст статьи {item['post_url']} для GPT-4. Пропуск.")
+        return None
+
+    translated_title, summary, summary_en = summarize_with_gpt(item['title'], full_text)
+    if not translated_title or not summary:
+        logging.warning(f"Не удалось получить перевод или выжимку для статьи {item['post_url']}. Пропуск.")
+        return None
+    item['translated_title'], item['summary'], item['summary_en'] = translated_title, summary, summary_en
+    return item
+
+# Стадия конвейера: запись в хранилище (повторный data_key игнорируется) и публикация
+def store_stage(item, publish=None):
+    try:
+        added = app.store.add_article(item['data_key'], item['title'], item['translated_title'], item['summary'],
+                                  item['post_url'], app.today(), item.get('source'), item.get('fingerprint'),
+                                  summary_en=item.get('summary_en'), seen_at=item.get('seen_at'))
+    except Exception as e:
+        logging.error(f"Ошибка при записи новости {item['title']} в хранилище: {e}")
+        return None
+    if added:
+        metrics.inc("articles_stored_total", source=item.get('source') or "unknown")
+        logging.info(f"Добавлена новость: {item['title']} (перевод: {item['translated_title']})")
+        if publish:
+            publish(item)
+    return item
+
+# Конвейер обработки статей; publish(article) вызывается для каждой новой сохранённой статьи
+def create_pipeline(publish=None):
+    pipeline = Pipeline(on_done=on_article_done)
+    pipeline.add_stage("extract", extract_stage, app.settings.extract_workers)
+    pipeline.add_stage("summarize", summarize_stage, app.settings.max_workers)
+    pipeline.add_stage("publish", lambda item: store_stage(item, publish), 1)
+    return pipeline
+
+# Функция подготовки текста для GPT-4: очистка, ограничение размера, map-reduce для длинных статей
+def prepare_for_llm(title, full_text, post_url):
+    prepared = app.text_budget.prepare(full_text)
+    logging.info(
+        f"Токены статьи {post_url}: исходно {prepared.tokens_before}, после очистки {prepared.tokens_after}, "
+        f"частей {len(prepared.chunks)}{' (текст обрезан)' if prepared.truncated else ''}."
+    )
+    if not prepared.needs_map_reduce:
+        return prepared.text
+
+    # Части длинной статьи сокращаются параллельно, итоговая выжимка строится по их конспектам
+    with ThreadPoolExecutor(max_workers=app.settings.chunk_workers) as executor:
+        partials = list(executor.map(lambda chunk: summarize_chunk(title, chunk), prepared.chunks))
+    if not all(partials):
+        return ""
+    condensed = "\n\n".join(partials)
+    logging.info(f"Конспект длинной статьи {post_url}: {count_tokens(condensed)} токенов.")
+    return condensed
+
+# Функция сокращения одной части длинной статьи
+def summarize_chunk(title, chunk):
+    from openai import OpenAIError
+
+    cache_key = make_key(GPT_MODEL, PROMPT_VERSION, "chunk", title, chunk)
+    cached = app.llm_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    prompt = f"""
+    You are an expert text analyst. Below is one part of a longer article. Write concise notes in English with the key facts, figures and arguments of this part (no more than 200 words).
+
+    Article title: {title}
+
+    Part of the article: {chunk}
+    """
+    try:
+        response = chat_completion(
+            "chunk",
+            model=GPT_MODEL,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=0.3,
+        )
+    except OpenAIError as e:
+        logging.error(f"Ошибка при сокращении части статьи через OpenAI API: {e}")
+        return None
+    log_usage(response, "части статьи", "chunk")
+    notes = (response.choices[0].message.content or "").strip()
+    if notes:
+        app.llm_cache.put(cache_key, notes)
+    return notes or None
+
+# Запрос к OpenAI с замером длительности (kind - вид запроса в метриках)
+def chat_completion(kind, **request):
+    with metrics.span("llm_request_seconds", kind=kind):
+        return app.openai.chat.completions.create(**request)
+
+# Логирование расхода токенов по ответу OpenAI и учёт токенов и стоимости в метриках
+def log_usage(response, stage, kind):
+    usage = getattr(response, 'usage', None)
+    if usage:
+        logging.info(f"Токены GPT-4 ({stage}): запрос {usage.prompt_tokens}, ответ {usage.completion_tokens}.")
+        record_usage(kind, usage.prompt_tokens, usage.completion_tokens)
+
+def record_usage(kind, prompt_tokens, completion_tokens, price_factor=1.0):
+    metrics.inc("llm_tokens_total", prompt_tokens, kind=kind, type="prompt")
+    metrics.inc("llm_tokens_total", completion_tokens, kind=kind, type="completion")
+    cost = (prompt_tokens * app.settings.gpt_price_input + completion_tokens * app.settings.gpt_price_output) / 1_000_000 * price_factor
+    metrics.inc("llm_cost_usd_total", cost, kind=kind)
+
+# Функция для извлечения полного текста статьи (selectors - селекторы текста источника)
+def fetch_full_text(url, selectors=None):
+    try:
+        logging.info(f"Загрузка статьи: {url}")
+        response = app.fetcher.get(url)
+        if response.status_code != 200:
+            logging.error(f"Ошибка загрузки статьи {url}: {response.status_code}")
+            return ""
+
+        # Текст берётся из блока статьи по селекторам сайта, без боковых колонок и комментариев
+        paragraphs = app.extractor.article(response.content, url, selectors)
+        if not paragraphs:
+            logging.error(f"Текст статьи не найден для {url}.")
+
+            # Сохранение HTML для анализа (в фоне, хранятся последние страницы)
+            path = app.error_capture.capture(url, response.content)
+            if path:
+                logging.info(f"HTML статьи {url} сохраняется в {path} для проверки.")
+            return ""
+
+        full_text = "\n".join(paragraphs)
+        logging.info(f"Извлечён полный текст статьи {url}, длина: {len(full_text)} символов.")
+        app.fetcher.remember(response)
+        return full_text
+
+    except Exception as e:
+        logging.error(f"Ошибка при парсинге текста статьи {url}: {e}")
+        return ""
+
+# Функция для перевода заголовка и создания выжимки текста: (заголовок, выжимка на русском,
+# выжимка на английском или None); при ошибке заголовок и выжимка - None
+def summarize_with_gpt(title, full_text):
+    from openai import OpenAIError, RateLimitError
+
+    try:
+        if app.settings.summary_mode == "structured":
+            return summarize_structured(title, full_text)
+
+        # Сначала создаем выжимку на основе полного текста (или берём её из кэша)
+        summary_key = make_key(GPT_MODEL, PROMPT_VERSION, "summary", title, full_text)
+        summary_en = app.llm_cache.get(summary_key)
+        if summary_en is not None:
+            logging.info("Выжимка статьи взята из кэша.")
+        else:
+            prompt_summary = f"""
+            Вы работаете как эксперт в области анализа текстов. Создайте выжимку из текста статьи на английском языке (не более 500 слов). Выжимка должна быть краткой, но содержать ключевые идеи статьи.
+
+            Заголовок: {title}
+
+            Текст статьи: {full_text}
+
+            Ответьте в формате:
+            Выжимка статьи:
+            """
+            logging.info("Отправка запроса к GPT-4 для выжимки...")
+            response_summary = chat_completion(
+                "summary",
+                model=GPT_MODEL,
+                messages=[{"role": "user", "content": prompt_summary}],
+                temperature=0.7,
+            )
+            logging.info("Ответ от GPT-4 для выжимки получен.")
+            log_usage(response_summary, "выжимка", "summary")
+
+            summary_en = response_summary.choices[0].message.content.strip()
+            if not summary_en.startswith("Выжимка статьи:"):
+                logging.error("Формат ответа GPT-4 для выжимки неожиданен.")
+                return None, None, None
+
+            summary_en = summary_en.replace("Выжимка статьи:", "").strip()
+            app.llm_cache.put(summary_key, summary_en)
+        logging.info(f"Получена выжимка статьи на английском: {len(summary_en)} символов.")
+
+        # Затем переводим заголовок и выжимку на русский язык
+        translation_key = make_key(GPT_MODEL, PROMPT_VERSION, "translation", title, summary_en)
+        cached = app.llm_cache.get(translation_key)
+        if cached is not None:
+            logging.info("Перевод статьи взят из кэша.")
+            translated_title, translated_summary = json.loads(cached)
+            return translated_title, translated_summary, summary_en
+
+        prompt_translation = f"""
+        Вы работаете как эксперт в области перевода. Переведите текст ниже на русский язык.
+
+        Заголовок: {title}
+
+        Выжимка статьи: {summary_en}
+
+        Ответьте в формате:
+        1. Переведенный заголовок:
+        2. Переведенная выжимка:
+        """
+        logging.info("Отправка запроса к GPT-4 для перевода...")
+        response_translation = chat_completion(
+            "translation",
+            model=GPT_MODEL,
+            messages=[{"role": "user", "content": prompt_translation}],
+            temperature=0.2,
+        )
+        logging.info("Ответ от GPT-4 для перевода получен.")
+        log_usage(response_translation, "перевод", "translation")
+
+        output = response_translation.choices[0].message.content.strip()
+        logging.debug(f"Ответ GPT-4 для перевода: {output}")
+
+        if "2. Переведенная выжимка:" not in output:
+            logging.error("Формат ответа GPT-4 для перевода неожиданен.")
+            return None, None, None
+
+        translated_title, translated_summary = output.split("2. Переведенная выжимка:", 1)
+        translated_title = translated_title.replace("1. Переведенный заголовок:", "").strip()
+        translated_summary = translated_summary.strip()
+        app.llm_cache.put(translation_key, json.dumps([translated_title, translated_summary], ensure_ascii=False))
+
+        logging.info(f"Получен перевод заголовка: {translated_title}")
+        logging.info(f"Получена переведенная выжимка статьи: {len(translated_summary)} символов.")
+
+        return translated_title, translated_summary, summary_en
+
+    except RateLimitError:
+        logging.error("Превышен лимит запросов к OpenAI API. Статья будет обработана в следующем цикле.")
+        return None, None, None
+    except OpenAIError as e:
+        logging.error(f"Ошибка при работе с OpenAI API: {e}")
+        return None, None, None
+    except Exception as e:
+        logging.error(f"Общая ошибка: {e}")
+        return None, None, None
+
+# Ответ модели не соответствует ожидаемой структуре
+class SummaryFormatError(ValueError):
+    pass
+
+# JSON-схема ответа для режима "structured"
+def structured_schema():
+    properties = {
+        "translated_title": {"type": "string", "description": "Заголовок статьи на русском языке"},
+        "summary_ru": {"type": "string", "description": "Выжимка статьи на русском языке"},
+    }
+    if app.settings.structured_include_en:
+        properties["summary_en"] = {"type": "string", "description": "Выжимка статьи на английском языке"}
+    return {
+        "type": "object",
+        "properties": properties,
+        "required": list(properties),
+        "additionalProperties": False,
+    }
+
+# Разбор и проверка ответа в режиме "structured"
+def parse_structured_reply(content, finish_reason=None, refusal=None):
+    if refusal:
+        raise SummaryFormatError(f"модель отказалась отвечать: {refusal}")
+    if finish_reason == "length":
+        raise SummaryFormatError("ответ обрезан по длине")
+    try:
+        data = json.loads(content or "")
+    except json.JSONDecodeError as e:
+        raise SummaryFormatError(f"некорректный JSON: {e}")
+    for field in structured_schema()["required"]:
+        if not isinstance(data.get(field), str) or not data[field].strip():
+            raise SummaryFormatError(f"поле {field} отсутствует или пустое")
+    return data
+
+def structured_cache_key(title, full_text):
+    return make_key(GPT_MODEL, PROMPT_VERSION, f"structured:en={int(app.settings.structured_include_en)}", title, full_text)
+
+# Параметры запроса chat.completions для режима "structured" (используются и в пакетном режиме)
+def structured_request(title, full_text):
+    prompt = f"""
+    Вы работаете как эксперт в области анализа и перевода текстов. Переведите заголовок статьи на русский язык и создайте выжимку статьи на русском языке (не более 500 слов). Выжимка должна быть краткой, но содержать ключевые идеи статьи.{" Также создайте ту же выжимку на английском языке." if app.settings.structured_include_en else ""}
+
+    Заголовок: {title}
+
+    Текст статьи: {full_text}
+    """
+    return {
+        "model": GPT_MODEL,
+        "messages": [{"role": "user", "content": prompt}],
+        "temperature": 0.4,
+        "response_format": {
+            "type": "json_schema",
+            "json_schema": {"name": "article_summary", "strict": True, "schema": structured_schema()},
+        },
+    }
+
+# Функция перевода заголовка и выжимки одним запросом со структурированным ответом
+def summarize_structured(title, full_text):
+    cache_key = structured_cache_key(title, full_text)
+    cached = app.llm_cache.get(cache_key)
+    if cached is not None:
+        logging.info("Перевод и выжимка статьи взяты из кэша.")
+        data = json.loads(cached)
+        return data["translated_title"], data["summary_ru"], data.get("summary_en")
+
+    for attempt in range(1, app.settings.structured_max_attempts + 1):
+        logging.info(f"Отправка структурированного запроса к GPT-4 (попытка {attempt})...")
+        response = chat_completion("structured", **structured_request(title, full_text))
+        log_usage(response, "структурированный ответ", "structured")
+        choice = response.choices[0]
+        try:
+            data = parse_structured_reply(choice.message.content, choice.finish_reason,
+                                          getattr(choice.message, 'refusal', None))
+        except SummaryFormatError as e:
+            logging.warning(f"Формат структурированного ответа GPT-4 неожиданен ({e}).")
+            continue
+
+        app.llm_cache.put(cache_key, json.dumps(data, ensure_ascii=False))
+        logging.info(f"Получен перевод заголовка: {data['translated_title']}")
+        logging.info(f"Получена переведенная выжимка статьи: {len(data['summary_ru'])} символов.")
+        return data["translated_title"], data["summary_ru"], data.get("summary_en")
+
+    logging.error(f"Не удалось получить корректный структурированный ответ за {app.settings.structured_max_attempts} попыток.")
+    return None, None, None
+
+# Разбор ответа из пакетного задания; корректный ответ также сохраняется в кэш
+def parse_batch_result(item, body):
+    choice = body["choices"][0]
+    message = choice.get("message") or {}
+    usage = body.get("usage") or {}
+    # Пакетные задания тарифицируются со скидкой 50%
+    record_usage("batch", usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0), price_factor=0.5)
+    data = parse_structured_reply(message.get("content"), choice.get("finish_reason"), message.get("refusal"))
+    app.llm_cache.put(structured_cache_key(item['title'], item['full_text']), json.dumps(data, ensure_ascii=False))
+    return data["translated_title"], data["summary_ru"], data.get("summary_en")
+
+# Пакетная обработка через Batch API (клиент OpenAI создаётся при первом обращении)
+def batch_processor():
+    return app.get('batch_processor', lambda: BatchProcessor(
+        app.store, OpenAIBatchBackend(app.openai), structured_request, parse_batch_result, app.today))
+
+# Функция отправки накопившихся статей одним пакетным заданием; копии отсеиваются, как в конвейере
+def submit_backlog(pending):
+    articles = []
+    checked = []
+    try:
+        with ThreadPoolExecutor(max_workers=app.settings.max_workers) as executor:
+            items = list(pending.values())
+            texts = executor.map(lambda item: fetch_full_text(item['post_url'], item['article_selectors']), items)
+            for item, full_text in zip(items, texts):
+                data_key, title, post_url = item['data_key'], item['title'], item['post_url']
+                if not full_text:
+                    logging.warning(f"Полный текст для статьи {post_url} не был получен. Пропуск.")
+                    continue
+                if find_duplicate(item, full_text):
+                    continue
+                checked.append(item)
+                full_text = prepare_for_llm(title, full_text, post_url)
+                if not full_text:
+                    continue
+                articles.append({'data_key': data_key, 'title': title, 'post_url': post_url, 'full_text': full_text,
+                                 'source': item['source'], 'fingerprint': item['fingerprint'],
+                                 'seen_at': item['seen_at']})
+                item['submitted'] = True
+        batch_processor().submit(articles)
+    except Exception as e:
+        logging.error(f"Ошибка отправки пакетного задания: {e}")
+        for item in checked:
+            item['submitted'] = False
+    finally:
+        # Отправленные статьи дальше находятся по отпечатку в batch_items
+        for item in checked:
+            release_fingerprint(item, item.get('submitted', False))
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Парсер новостей")
+    arg_parser.add_argument("--backlog", action="store_true", help="обработать новые статьи пакетным заданием")
+    arg_parser.add_argument("--wait", action="store_true", help="дождаться завершения пакетных заданий")
+    args = arg_parser.parse_args()
+
+    load_dotenv()
+    setup_logging("parser.log")
+    if not app.settings.openai_api_key:
+        logging.error("OPENAI_API_KEY не установлена в переменных окружения.")
+        exit(1)
+
+    clean_old_entries()
+    fetch_news(backlog=args.backlog or None)
+    if args.wait:
+        batch_processor().wait(poll_interval=app.settings.batch_poll_interval)
@@ -0,0 +1,117 @@
+import logging
+import queue
+import threading
+
+import metrics
+
+# Маркер остановки потоков стадии
+_STOP = object()
+
+# Стадия может вернуть DONE: статья успешно покидает конвейер досрочно (например, дубликат)
+DONE = object()
+
+
+# Стадия конвейера: очередь на входе и несколько потоков-обработчиков
+class Stage:
+    def __init__(self, name, func, workers):
+        self.name = name
+        self.func = func  # func(item) -> item для следующей стадии, DONE или None, если обработка не удалась
+        self.workers = workers
+        self.queue = queue.Queue()
+        self.threads = []
+
+
+# Потоковый конвейер: каждая статья проходит стадии независимо от остальных
+class Pipeline:
+    def __init__(self, on_done=None):
+        self.stages = []
+        self.on_done = on_done  # on_done(item, ok) вызывается, когда статья покидает конвейер
+        self.lock = threading.Lock()
+        self.in_flight = set()
+
+    def add_stage(self, name, func, workers=1):
+        self.stages.append(Stage(name, func, workers))
+        return self
+
+    def start(self):
+        for index, stage in enumerate(self.stages):
+            for number in range(stage.workers):
+                thread = threading.Thread(target=self._run, args=(index,), name=f"{stage.name}-{number}", daemon=True)
+                thread.start()
+                stage.threads.append(thread)
+        logging.info("Конвейер запущен: " + ", ".join(f"{s.name} x{s.workers}" for s in self.stages) + ".")
+
+    # Добавляет статью; False, если статья с таким ключом уже в обработке
+    def submit(self, key, item):
+        with self.lock:
+            if key in self.in_flight:
+                return False
+            self.in_flight.add(key)
+        item['_key'] = key
+        self.stages[0].queue.put(item)
+        return True
+
+    def is_in_flight(self, key):
+        with self.lock:
+            return key in self.in_flight
+
+    # Ожидание, пока все поставленные статьи пройдут конвейер
+    def join(self):
+        for stage in self.stages:
+            stage.queue.join()
+
+    def stop(self):
+        for stage in self.stages:
+            for _ in stage.threads:
+                stage.queue.put(_STOP)
+            for thread in stage.threads:
+                thread.join()
+            stage.threads = []
+
+    def _run(self, index):
+        stage = self.stages[index]
+        while True:
+            item = stage.queue.get()
+            if item is _STOP:
+                stage.queue.task_done()
+                return
+            try:
+                with metrics.span("pipeline_stage_seconds", stage=stage.name):
+                    result = stage.func(item)
+            except Exception as e:
+                logging.error(f"Ошибка на стадии {stage.name} для {item.get('post_url', item['_key'])}: {e}")
+                result = None
+            try:
+                if result is None or result is DONE or index + 1 == len(self.stages):
+                    self._finish(item, ok=result is not None)
+                else:
+                    self.stages[index + 1].queue.put(result)
+            finally:
+                stage.queue.task_done()
+
+    def _finish(self, item, ok):
+        with self.lock:
+            self.in_flight.discard(item['_key'])
+        if self.on_done:
+            try:
+                self.on_done(item, ok)
+            except Exception as e:
+                logging.error(f"Ошибка обработчика завершения конвейера: {e}")
+
+
+# Учёт статей одного цикла опроса: on_complete(failed) вызывается, когда обработаны все статьи
+class CycleTracker:
+    def __init__(self, total, on_complete):
+        self.remaining = total
+        self.failed = 0
+        self.on_complete = on_complete
+        self.lock = threading.Lock()
+
+    def done(self, ok):
+        with self.lock:
+            self.remaining -= 1
+            if not ok:
+                self.failed += 1
+            finished = self.remaining == 0
+        if finished:
+            self.on_complete(self.failed)
@@ -0,0 +1,61 @@
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+
+# Токен-бакет: не более `rate` операций в секунду с запасом `capacity`
+class TokenBucket:
+    def __init__(self, rate, capacity=1):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    # Сколько секунд ждать до появления токена (0 - токен взят)
+    def try_acquire(self, tokens=1):
+        with self.lock:
+            self._refill()
+            if self.tokens >= tokens:
+                self.tokens -= tokens
+                return 0.0
+            return (tokens - self.tokens) / self.rate
+
+    # Блокирующее получение токена
+    def acquire(self, tokens=1):
+        while True:
+            wait = self.try_acquire(tokens)
+            if wait <= 0:
+                return
+            time.sleep(wait)
+
+
+# Ограничитель запросов к сайтам: одновременные соединения и темп на каждый хост
+class HostLimiter:
+    def __init__(self, concurrency, rate, burst=1):
+        self.concurrency = concurrency
+        self.rate = rate
+        self.burst = burst
+        self.semaphores = {}
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def _get(self, host):
+        with self.lock:
+            if host not in self.semaphores:
+                self.semaphores[host] = threading.BoundedSemaphore(self.concurrency)
+                self.buckets[host] = TokenBucket(self.rate, self.burst)
+            return self.semaphores[host], self.buckets[host]
+
+    @contextmanager
+    def limit(self, url):
+        semaphore, bucket = self._get(urlparse(url).netloc)
+        with semaphore:
+            bucket.acquire()
+            yield
@@ -0,0 +1,61 @@
+import logging
+import time
+
+HOUR = 3600
+DAY = 24 * HOUR
+
+
+# Интервал опроса по истории публикаций источника: по времени появления статей за lookback_days дней
+# строится профиль по часам суток, и в активные часы источник опрашивается чаще. Интервал
+# подбирается так, чтобы за один опрос в среднем появлялось target_articles новых статей,
+# и ограничивается min_interval/max_interval. В тихие часы темп не считается ниже среднего за сутки,
+# поэтому час без истории опрашивается не реже, чем при равномерных публикациях. Пока истории мало,
+# используется poll_interval источника. Статьи первого опроса и догрузки после простоя в историю
+# не попадают (см. news_parser.activity_time)
+class AdaptiveSchedule:
+    def __init__(self, store, min_interval=300, max_interval=3600, lookback_days=14, target_articles=0.5,
+                 min_samples=5, cache_ttl=600):
+        self.store = store
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.lookback_days = lookback_days
+        self.target_articles = target_articles
+        self.min_samples = min_samples
+        self.cache_ttl = cache_ttl
+        self.profiles = {}  # source -> (время расчёта, статей в час по часам суток с учётом среднего или None)
+
+    def interval(self, source, now=None):
+        now = now or time.time()
+        rates = self.profile(source.name, now)
+        if rates is None:
+            return self.clamp(source.poll_interval)
+        return self.clamp(self.target_articles / rates[time.localtime(now).tm_hour] * HOUR)
+
+    def clamp(self, interval):
+        return max(self.min_interval, min(self.max_interval, interval))
+
+    # Среднее число новых статей в час для каждого часа суток (сглажено по соседним часам,
+    # не ниже среднего за сутки)
+    def profile(self, name, now):
+        cached = self.profiles.get(name)
+        if cached and now - cached[0] < self.cache_ttl:
+            return cached[1]
+
+        times = self.store.source_activity(name, now - self.lookback_days * DAY)
+        rates = None
+        # Профиль строится по истории не короче суток: иначе часы без наблюдений неотличимы от тихих
+        if len(times) >= self.min_samples and now - times[0] >= DAY:
+            days = min(self.lookback_days, (now - times[0]) / DAY)
+            counts = [0] * 24
+            for seen_at in times:
+                counts[time.localtime(seen_at).tm_hour] += 1
+            mean_rate = len(times) / days / 24  # Средний темп за сутки, статей в час
+            rates = [
+                max(mean_rate, (counts[(hour - 1) % 24] + 2 * counts[hour] + counts[(hour + 1) % 24]) / 4 / days)
+                for hour in range(24)
+            ]
+            busiest = max(range(24), key=lambda hour: rates[hour])
+            logging.info(f"Профиль публикаций {name}: {len(times)} статей за {days:.1f} дн., "
+                         f"чаще всего около {busiest}:00 ({rates[busiest]:.2f} в час).")
+        self.profiles[name] = (now, rates)
+        return rates
@@ -0,0 +1,113 @@
+import json
+import logging
+import os
+import threading
+import time
+import xml.etree.ElementTree as ET
+
+ATOM_NS = "{http://www.w3.org/2005/Atom}"
+
+# Источник новостей. Если задан feed_url, используется RSS/Atom (дешевле разбора HTML),
+# при ошибке ленты - страница listing_url со ссылками по listing_selector
+class Source:
+    def __init__(self, name, listing_url=None, feed_url=None, listing_selector=None,
+                 article_selectors=None, poll_interval=3600):
+        if not listing_url and not feed_url:
+            raise ValueError(f"Источник {name}: нужен listing_url или feed_url")
+        if listing_url and not listing_selector:
+            raise ValueError(f"Источник {name}: для listing_url нужен listing_selector")
+        self.name = name
+        self.listing_url = listing_url
+        self.feed_url = feed_url
+        self.listing_selector = listing_selector
+        self.article_selectors = article_selectors or []
+        self.poll_interval = poll_interval
+
+    def __repr__(self):
+        return f"Source({self.name!r})"
+
+
+DEFAULT_SOURCES = [
+    Source(
+        "climaterealism",
+        listing_url="https://climaterealism.com/",
+        feed_url="https://climaterealism.com/feed/",
+        listing_selector="h3.entry-title.td-module-title a",
+        article_selectors=["div.td-post-content p"],
+        poll_interval=3600,
+    ),
+]
+
+
+# Загрузка списка источников из JSON-файла, например:
+# [{"name": "climaterealism", "feed_url": "https://climaterealism.com/feed/",
+#   "listing_url": "https://climaterealism.com/", "listing_selector": "h3.entry-title a",
+#   "article_selectors": ["div.td-post-content p"], "poll_interval": 3600}]
+def load_sources(path):
+    if not path or not os.path.exists(path):
+        return list(DEFAULT_SOURCES)
+    with open(path, 'r', encoding='utf-8') as file:
+        sources = [Source(**entry) for entry in json.load(file)]
+    logging.info(f"Загружено {len(sources)} источников из {path}.")
+    return sources
+
+
+# Заголовки и ссылки из RSS 2.0 или Atom
+def parse_feed(content):
+    root = ET.fromstring(content)
+    items = []
+    for item in root.iter("item"):
+        link = (item.findtext("link") or "").strip()
+        if link:
+            items.append(((item.findtext("title") or "").strip() or "Без заголовка", link))
+    for entry in root.iter(f"{ATOM_NS}entry"):
+        link = None
+        for link_tag in entry.findall(f"{ATOM_NS}link"):
+            if link_tag.get("rel", "alternate") == "alternate" and link_tag.get("href"):
+                link = link_tag.get("href")
+                break
+        if link:
+            items.append(((entry.findtext(f"{ATOM_NS}title") or "").strip() or "Без заголовка", link))
+    return items
+
+
+# Реестр источников с учётом времени следующего опроса каждого из них.
+# interval(source, now) задаёт паузу до следующего опроса (по умолчанию poll_interval источника)
+class SourceRegistry:
+    def __init__(self, sources, interval=None):
+        self.sources = list(sources)
+        self.interval = interval or (lambda source, now: source.poll_interval)
+        self.next_poll = {source.name: 0.0 for source in self.sources}
+        self.lock = threading.Lock()
+
+    # Источники, которые пора опросить; их следующий опрос сразу планируется
+    def take_due(self, now=None, force=False):
+        now = now or time.time()
+        with self.lock:
+            due = [s for s in self.sources if force or self.next_poll[s.name] <= now]
+            for source in due:
+                self.next_poll[source.name] = now + source.poll_interval
+        # Интервал может требовать запроса к базе, поэтому считается вне блокировки
+        for source in due:
+            try:
+                interval = self.interval(source, now)
+            except Exception as e:
+                logging.error(f"Ошибка расчёта интервала опроса {source.name}: {e}")
+                interval = source.poll_interval
+            with self.lock:
+                self.next_poll[source.name] = now + interval
+            logging.info(f"Следующий опрос {source.name} через {interval / 60:.0f} мин.")
+        return due
+
+    # Делает источники (по умолчанию все) подлежащими опросу при следующей проверке
+    def make_due(self, names=None):
+        with self.lock:
+            for name in names or self.next_poll:
+                if name in self.next_poll:
+                    self.next_poll[name] = 0.0
+
+    # Секунд до ближайшего запланированного опроса
+    def seconds_until_due(self, now=None):
+        now = now or time.time()
+        with self.lock:
+            return max(0.0, min(self.next_poll.values(), default=0.0) - now)
@@ -0,0 +1,337 @@
+import csv
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+ARTICLE_FIELDS = ['data_key', 'title', 'translated_title', 'summary', 'post_url', 'parsed_date']
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS articles (
+    data_key TEXT PRIMARY KEY,
+    title TEXT NOT NULL,
+    translated_title TEXT NOT NULL,
+    summary TEXT NOT NULL,
+    post_url TEXT NOT NULL,
+    parsed_date TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    source TEXT,
+    fingerprint TEXT,
+    summary_en TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_articles_parsed_date ON articles(parsed_date);
+CREATE TABLE IF NOT EXISTS article_log (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    data_key TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_article_log_data_key ON article_log(data_key);
+CREATE TABLE IF NOT EXISTS source_activity (
+    source TEXT NOT NULL,
+    seen_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_source_activity ON source_activity(source, seen_at);
+CREATE TABLE IF NOT EXISTS duplicates (
+    data_key TEXT PRIMARY KEY,
+    duplicate_of TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_duplicates_created_at ON duplicates(created_at);
+CREATE TABLE IF NOT EXISTS sent (
+    data_key TEXT PRIMARY KEY,
+    sent_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_sent_sent_at ON sent(sent_at);
+CREATE TABLE IF NOT EXISTS batch_items (
+    data_key TEXT PRIMARY KEY,
+    batch_id TEXT NOT NULL,
+    title TEXT NOT NULL,
+    post_url TEXT NOT NULL,
+    full_text TEXT NOT NULL,
+    submitted_at REAL NOT NULL,
+    source TEXT,
+    fingerprint TEXT,
+    seen_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_batch_items_batch_id ON batch_items(batch_id);
+CREATE TABLE IF NOT EXISTS http_cache (
+    url TEXT PRIMARY KEY,
+    etag TEXT,
+    last_modified TEXT,
+    content_hash TEXT,
+    body BLOB,
+    fetched_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS deliveries (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    data_key TEXT NOT NULL,
+    chat_id TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    last_error TEXT,
+    created_at REAL NOT NULL,
+    UNIQUE (data_key, chat_id)
+);
+CREATE INDEX IF NOT EXISTS idx_deliveries_due ON deliveries(status, chat_id, next_attempt_at);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+# Хранилище статей и состояния доставки в SQLite (WAL, индексы по data_key и дате)
+class ArticleStore:
+    def __init__(self, path):
+        self.path = path
+        self.local = threading.local()
+        with self._conn() as conn:
+            conn.executescript(SCHEMA)
+            self._migrate_schema(conn)
+
+    # Добавляет столбцы, появившиеся после создания базы
+    def _migrate_schema(self, conn):
+        columns = {row['name'] for row in conn.execute("PRAGMA table_info(articles)")}
+        for column in ('source', 'fingerprint', 'summary_en'):
+            if column not in columns:
+                conn.execute(f"ALTER TABLE articles ADD COLUMN {column} TEXT")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_articles_fingerprint ON articles(fingerprint)")
+        columns = {row['name'] for row in conn.execute("PRAGMA table_info(batch_items)")}
+        for column, column_type in (('source', 'TEXT'), ('fingerprint', 'TEXT'), ('seen_at', 'REAL')):
+            if column not in columns:
+                conn.execute(f"ALTER TABLE batch_items ADD COLUMN {column} {column_type}")
+        # Статьи, сохранённые до появления журнала, попадают в него в порядке добавления
+        conn.execute(
+            "INSERT INTO article_log (data_key) SELECT a.data_key FROM articles a "
+            "WHERE NOT EXISTS (SELECT 1 FROM article_log l WHERE l.data_key = a.data_key) ORDER BY a.created_at"
+        )
+
+    # Отдельное соединение на поток: sqlite3 не разделяет соединения между потоками
+    def _conn(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self.local.conn = conn
+        return conn
+
+    def get_meta(self, key, default=None):
+        row = self._conn().execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row['value'] if row else default
+
+    def set_meta(self, key, value):
+        with self._conn() as conn:
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    # Статья уже сохранена, отправлена или признана дубликатом
+    # (после очистки остаётся только отметка об отправке)
+    def is_known(self, data_key):
+        conn = self._conn()
+        for table in ('articles', 'sent', 'duplicates'):
+            if conn.execute(f"SELECT 1 FROM {table} WHERE data_key = ?", (data_key,)).fetchone():
+                return True
+        return False
+
+    # Добавляет статью и запись в журнал в одной транзакции; возвращает False, если такой data_key уже есть.
+    # summary_en - английская выжимка, если она получена. seen_at - время опроса, в котором статья появилась
+    # у источника; без него статья не попадает в историю публикаций (первый опрос, догрузка после простоя).
+    # Сохранённая статья больше не загружается, поэтому тело её страницы удаляется из http_cache
+    def add_article(self, data_key, title, translated_title, summary, post_url, parsed_date,
+                    source=None, fingerprint=None, summary_en=None, seen_at=None):
+        with self._conn() as conn:
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO articles (data_key, title, translated_title, summary, post_url, parsed_date, "
+                "created_at, source, fingerprint, summary_en) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (data_key, title, translated_title, summary, post_url, parsed_date, time.time(), source, fingerprint,
+                 summary_en),
+            )
+            if cursor.rowcount == 1:
+                conn.execute("INSERT INTO article_log (data_key) VALUES (?)", (data_key,))
+                conn.execute("DELETE FROM http_cache WHERE url = ?", (post_url,))
+                if source and seen_at:
+                    conn.execute("INSERT INTO source_activity (source, seen_at) VALUES (?, ?)", (source, seen_at))
+        return cursor.rowcount == 1
+
+    # Время появления новых статей источника начиная с since (хранится дольше самих статей)
+    def source_activity(self, source, since):
+        rows = self._conn().execute(
+            "SELECT seen_at FROM source_activity WHERE source = ? AND seen_at >= ? ORDER BY seen_at", (source, since)
+        ).fetchall()
+        return [row['seen_at'] for row in rows]
+
+    # data_key сохранённой или ожидающей пакетного задания статьи с таким отпечатком содержимого
+    def find_by_fingerprint(self, fingerprint):
+        row = self._conn().execute(
+            "SELECT data_key FROM articles WHERE fingerprint = ? "
+            "UNION ALL SELECT data_key FROM batch_items WHERE fingerprint = ? LIMIT 1",
+            (fingerprint, fingerprint),
+        ).fetchone()
+        return row['data_key'] if row else None
+
+    # Запоминает дубликат, чтобы не загружать его повторно
+    def add_duplicate(self, data_key, duplicate_of):
+        with self._conn() as conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO duplicates (data_key, duplicate_of, created_at) VALUES (?, ?, ?)",
+                (data_key, duplicate_of, time.time()),
+            )
+
+    # Последняя позиция журнала статей
+    def last_offset(self):
+        return self._conn().execute("SELECT COALESCE(MAX(seq), 0) FROM article_log").fetchone()[0]
+
+    # Статьи из журнала после позиции offset, по batch_size за запрос, без загрузки всей таблицы.
+    # Позиции (seq) растут монотонно и не переиспользуются после очистки, поэтому сохранённая
+    # позиция читателя остаётся верной между запусками
+    def read_articles(self, offset=0, unsent_only=False, batch_size=100):
+        sent_filter = "AND NOT EXISTS (SELECT 1 FROM sent s WHERE s.data_key = a.data_key) " if unsent_only else ""
+        while True:
+            rows = self._conn().execute(
+                "SELECT l.seq, a.* FROM article_log l JOIN articles a ON a.data_key = l.data_key "
+                f"WHERE l.seq > ? {sent_filter}ORDER BY l.seq LIMIT ?",
+                (offset, batch_size),
+            ).fetchall()
+            for row in rows:
+                yield dict(row)
+            if len(rows) < batch_size:
+                return
+            offset = rows[-1]['seq']
+
+    def mark_sent(self, data_key):
+        with self._conn() as conn:
+            conn.execute("INSERT OR IGNORE INTO sent (data_key, sent_at) VALUES (?, ?)", (data_key, time.time()))
+
+    # Ставит статью в очередь доставки для каждого чата и отмечает её как переданную на отправку
+    def enqueue_delivery(self, data_key, chat_ids, payload):
+        now = time.time()
+        with self._conn() as conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO deliveries (data_key, chat_id, payload, next_attempt_at, created_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [(data_key, str(chat_id), payload, now, now) for chat_id in chat_ids],
+            )
+            conn.execute("INSERT OR IGNORE INTO sent (data_key, sent_at) VALUES (?, ?)", (data_key, now))
+
+    # Ближайшая доставка в чат, время которой уже наступило
+    def next_delivery(self, chat_id, now):
+        row = self._conn().execute(
+            "SELECT * FROM deliveries WHERE status = 'pending' AND chat_id = ? AND next_attempt_at <= ? "
+            "ORDER BY next_attempt_at, id LIMIT 1",
+            (str(chat_id), now),
+        ).fetchone()
+        return dict(row) if row else None
+
+    def pending_deliveries(self):
+        return self._conn().execute("SELECT COUNT(*) FROM deliveries WHERE status = 'pending'").fetchone()[0]
+
+    def complete_delivery(self, delivery_id):
+        with self._conn() as conn:
+            conn.execute("UPDATE deliveries SET status = 'sent', attempts = attempts + 1 WHERE id = ?", (delivery_id,))
+
+    def reschedule_delivery(self, delivery_id, next_attempt_at, error, attempts):
+        with self._conn() as conn:
+            conn.execute(
+                "UPDATE deliveries SET next_attempt_at = ?, last_error = ?, attempts = ? WHERE id = ?",
+                (next_attempt_at, error, attempts, delivery_id),
+            )
+
+    def fail_delivery(self, delivery_id, error, attempts):
+        with self._conn() as conn:
+            conn.execute(
+                "UPDATE deliveries SET status = 'failed', last_error = ?, attempts = ? WHERE id = ?",
+                (error, attempts, delivery_id),
+            )
+
+    # Статья отправлена в пакетное задание и ждёт результата
+    def in_batch(self, data_key):
+        return self._conn().execute("SELECT 1 FROM batch_items WHERE data_key = ?", (data_key,)).fetchone() is not None
+
+    def add_batch_items(self, batch_id, articles):
+        with self._conn() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO batch_items "
+                "(data_key, batch_id, title, post_url, full_text, submitted_at, source, fingerprint, seen_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [(a['data_key'], batch_id, a['title'], a['post_url'], a['full_text'], time.time(),
+                  a.get('source'), a.get('fingerprint'), a.get('seen_at')) for a in articles],
+            )
+
+    def open_batches(self):
+        rows = self._conn().execute("SELECT DISTINCT batch_id FROM batch_items").fetchall()
+        return [row['batch_id'] for row in rows]
+
+    def get_batch_items(self, batch_id):
+        rows = self._conn().execute("SELECT * FROM batch_items WHERE batch_id = ?", (batch_id,)).fetchall()
+        return {row['data_key']: dict(row) for row in rows}
+
+    def remove_batch(self, batch_id):
+        with self._conn() as conn:
+            conn.execute("DELETE FROM batch_items WHERE batch_id = ?", (batch_id,))
+
+    # Валидаторы (ETag/Last-Modified), хеш и сжатое тело последнего ответа по URL
+    def get_http_cache(self, url):
+        row = self._conn().execute("SELECT * FROM http_cache WHERE url = ?", (url,)).fetchone()
+        return dict(row) if row else None
+
+    def set_http_cache(self, url, etag, last_modified, content_hash, body):
+        with self._conn() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO http_cache (url, etag, last_modified, content_hash, body, fetched_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (url, etag, last_modified, content_hash, body, time.time()),
+            )
+
+    # Удаляет статьи старше указанной даты, их записи в журнале, старые завершённые доставки, историю
+    # публикаций и ответы в http_cache, кроме keep_urls (списки статей и ленты источников). Отметки об
+    # отправке и дубликаты не удаляются: это единственная защита от повторной публикации статьи, которая
+    # долго остаётся в списке или ленте. Всё выполняется одной транзакцией: при сбое база остаётся
+    # в прежнем состоянии
+    def prune(self, keep_from_date, retention_days=30, keep_urls=()):
+        with self._conn() as conn:
+            articles = conn.execute("DELETE FROM articles WHERE parsed_date < ?", (keep_from_date,)).rowcount
+            conn.execute(
+                "DELETE FROM article_log WHERE NOT EXISTS (SELECT 1 FROM articles a WHERE a.data_key = article_log.data_key)"
+            )
+            cutoff = time.time() - retention_days * 86400
+            conn.execute("DELETE FROM deliveries WHERE status != 'pending' AND created_at < ?", (cutoff,))
+            conn.execute("DELETE FROM source_activity WHERE seen_at < ?", (cutoff,))
+            keep_urls = list(keep_urls)
+            conn.execute(
+                f"DELETE FROM http_cache WHERE fetched_at < ? AND url NOT IN ({', '.join('?' * len(keep_urls))})",
+                [cutoff] + keep_urls,
+            )
+        return articles
+
+    # Однократный перенос данных из news.csv и sent_news.txt
+    def migrate_legacy(self, csv_file, sent_file):
+        if self.get_meta('legacy_migrated'):
+            return
+        articles = sent = 0
+        with self._conn() as conn:
+            if os.path.exists(csv_file):
+                with open(csv_file, 'r', encoding='utf-8') as file:
+                    for row in csv.DictReader(file):
+                        cursor = conn.execute(
+                            "INSERT OR IGNORE INTO articles "
+                            "(data_key, title, translated_title, summary, post_url, parsed_date, created_at) "
+                            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                            tuple(row[field] for field in ARTICLE_FIELDS) + (time.time(),),
+                        )
+                        if cursor.rowcount == 1:
+                            conn.execute("INSERT INTO article_log (data_key) VALUES (?)", (row['data_key'],))
+                        articles += cursor.rowcount
+            if os.path.exists(sent_file):
+                with open(sent_file, 'r', encoding='utf-8') as file:
+                    for line in file:
+                        if line.strip():
+                            cursor = conn.execute(
+                                "INSERT OR IGNORE INTO sent (data_key, sent_at) VALUES (?, ?)",
+                                (line.strip(), time.time()),
+                            )
+                            sent += cursor.rowcount
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('legacy_migrated', ?)", (str(time.time()),))
+        logging.info(f"Миграция из {csv_file} и {sent_file}: перенесено {articles} статей и {sent} отправленных ключей.")